@@ -0,0 +1,193 @@
+"""Benchmarks for the expert engine and the data paths of the views.
+
+    python benchmarks/bench.py                      # run, write benchmarks/results.json, compare to the baseline
+    python benchmarks/bench.py --save-baseline      # run and store the results as benchmarks/baseline.json
+    python benchmarks/bench.py --sizes 10 1000      # user counts for the storage benchmarks
+
+Each benchmark reports the median and minimum time per call over several repeats. When a baseline
+exists, any benchmark slower than baseline * (1 + tolerance) is reported and the exit code is 1.
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(os.path.join(ROOT_DIR, "src"))
+
+import numpy as np
+
+import expert
+import projection
+from chart_data import build_chart_frames
+from storage import JsonFileStore, SqliteStore
+
+RESULTS_PATH = os.path.join(BENCH_DIR, "results.json")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+CATEGORY_COUNTS = [5, 50, 500, 5000]
+PROJECTION_USERS = [1, 1000, 100000]
+REPEAT = 5
+
+VITAL_EXPENSES = {"rent": 800.0, "groceries": 300.0, "transportation": 100.0, "pet_expenses": 100.0}
+NON_VITAL_EXPENSES = {"leisures": 250.0}
+PROFILE = (VITAL_EXPENSES, NON_VITAL_EXPENSES, "Buy a car", 2500.0, 3000.0, 100.0, 5)
+
+
+def measure(function, repeat=REPEAT):
+    """Returns the median and minimum seconds per call of function."""
+    timer = timeit.Timer(function)
+    loops, _ = timer.autorange()
+    timings = [total / loops for total in timer.repeat(repeat=repeat, number=loops)]
+    return {"seconds": statistics.median(timings), "min": min(timings), "loops": loops}
+
+
+def bench_engine():
+    yield "expert.main", lambda: expert.main(*PROFILE)
+    yield "expert.main[compiled]", lambda: expert.main(*PROFILE, compiled=True)
+
+
+# Keyword arguments each rule receives from its matched facts
+RULE_ARGUMENTS = {
+    "calculate_savings_rate": {"goal": "Buy a car", "income": 2500.0, "expenses": 1550.0},
+    "feasibility_check": {"savings_rate": 950.0, "target": 3000.0, "timeline": 5, "savings": 100.0},
+    "generate_milestones_without_savings": {"target": 3000.0, "timeline": 5, "savings": 100.0, "savings_rate": 950.0},
+    "savings_exceeds_milestone": {},
+    "generate_milestones": {"target": 3000.0, "timeline": 5, "savings": 100.0},
+    "calculate_rule": {"income": 2500.0, "vital_expenses": VITAL_EXPENSES, "non_vital_expenses": NON_VITAL_EXPENSES},
+    "suggest_budget_adjustments": {
+        "target": 30000.0, "savings": 100.0, "non_vital_expenses": NON_VITAL_EXPENSES, "savings_rate": 950.0, "timeline": 5
+    },
+}
+
+
+def bench_rules():
+    engine = expert.SavingsGoalTracker()
+    engine.reset()
+    for rule in engine.get_rules():
+        name = rule._wrapped.__name__
+        if name not in RULE_ARGUMENTS:
+            print(f"No arguments for rule {name}, skipped", file=sys.stderr)
+            continue
+        # Re-declaring the same facts is a no-op for experta, so repeated calls stay comparable
+        bound = getattr(engine, name)
+        yield f"rule.{name}", lambda bound=bound, arguments=RULE_ARGUMENTS[name]: bound(**arguments)
+
+
+def bench_50_30_20():
+    for count in CATEGORY_COUNTS:
+        vital = {f"vital_{i}": 10.0 for i in range(count // 2)}
+        non_vital = {f"non_vital_{i}": 5.0 for i in range(count - count // 2)}
+        yield f"apply_50_30_20_rule[{count} categories]", (
+            lambda vital=vital, non_vital=non_vital: expert.apply_50_30_20_rule({}, 2500.0, vital, non_vital)
+        )
+
+
+def bench_projection():
+    rng = np.random.default_rng(0)
+    for count in PROJECTION_USERS:
+        target = rng.uniform(1e3, 2e5, count)
+        saving = rng.uniform(0, 5e4, count)
+        contribution = rng.uniform(0, 2000, count)
+        yield f"projection.completion_month[{count} users]", (
+            lambda target=target, saving=saving, contribution=contribution:
+            projection.completion_month(target, saving, contribution)
+        )
+
+
+def user_record():
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = expert.main(*PROFILE)
+    return {"result": result, "vital_expenses": VITAL_EXPENSES, "non_vital_expenses": NON_VITAL_EXPENSES, "income": 2500.0}
+
+
+def bench_storage(sizes, directory):
+    record = user_record()
+    for size in sizes:
+        users = {f"user_{i}": copy.deepcopy(record) for i in range(size)}
+        username = f"user_{size // 2}"
+
+        json_path = os.path.join(directory, f"result_{size}.json")
+        with open(json_path, "w") as outfile:
+            json.dump(users, outfile, indent=4)
+        json_store = JsonFileStore(json_path)
+        # save_user_data with the original whole-file rewrite, and the charts page loading one user from it
+        yield f"save_user_data.json[{size} users]", lambda store=json_store: store.update(username, record)
+        yield f"charts_load.json[{size} users]", lambda store=json_store: build_chart_frames(store.get(username), {})
+
+        sqlite_store = SqliteStore(os.path.join(directory, f"result_{size}.db"))
+        for name, user in users.items():
+            sqlite_store.update(name, user)
+        yield f"save_user_data.sqlite[{size} users]", lambda store=sqlite_store: store.update(username, record)
+        yield f"charts_load.sqlite[{size} users]", lambda store=sqlite_store: build_chart_frames(store.get(username), {})
+
+
+def run(sizes):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        for benchmarks in (bench_engine(), bench_rules(), bench_50_30_20(), bench_projection(), bench_storage(sizes, directory)):
+            for name, function in benchmarks:
+                results[name] = measure(function)
+                print(f"{name}: {results[name]['seconds'] * 1e6:,.1f} us", file=sys.stderr)
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Returns the benchmarks slower than the baseline by more than tolerance, as (name, ratio)."""
+    regressions = []
+    for name, timing in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None or reference["seconds"] <= 0:
+            continue
+        ratio = timing["seconds"] / reference["seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fin Genius benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="user counts for the storage benchmarks")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    current = run(args.sizes)
+    with open(args.output, "w") as outfile:
+        json.dump(current, outfile, indent=4)
+    if args.save_baseline:
+        with open(args.baseline, "w") as outfile:
+            json.dump(current, outfile, indent=4)
+        print(f"Baseline saved to {args.baseline}", file=sys.stderr)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one", file=sys.stderr)
+        return 0
+    with open(args.baseline) as infile:
+        baseline = json.load(infile)
+    regressions = compare(current, baseline, args.tolerance)
+    for name, ratio in regressions:
+        print(f"REGRESSION {name}: {ratio:.2f}x the baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
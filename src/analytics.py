@@ -0,0 +1,280 @@
+"""Columnar store of the numeric results of every submission, for questions across users.
+
+    python src/analytics.py --backfill     # (re)build from the submission history and the stored records
+    python src/analytics.py                # a few aggregates over the latest result of every user
+
+Each save appends a small Parquet file to a month partition (analytics/month=YYYY-MM/); a
+background compaction merges the files of each partition. The save also overwrites the user's row
+in the latest dataset (analytics/_latest/), one row per user spread over LATEST_BUCKETS files, so
+questions about the current state of every user never scan the history. Queries go through
+pyarrow.dataset, so only the requested columns are read and filters skip partitions and row
+groups by their statistics.
+"""
+import argparse
+import os
+import shutil
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from jobs import start_periodic
+from storage import file_lock
+
+ANALYTICS_PATH = "analytics"
+# Directory of the latest row of every user, inside ANALYTICS_PATH (pyarrow skips names starting with "_")
+LATEST_DIRECTORY = "_latest"
+# Files of the latest dataset: a save rewrites the one holding its user
+LATEST_BUCKETS = 64
+# Partitions with more files than this are merged by compact()
+COMPACTION_MIN_FILES = 16
+COMPACTION_INTERVAL = 3600
+
+SCHEMA = pa.schema([
+    ("username", pa.string()),
+    ("ts", pa.timestamp("us")),
+    ("income", pa.float64()),
+    ("saving", pa.float64()),
+    ("saving_target", pa.float64()),
+    ("saving_timeline", pa.float64()),
+    ("total_expenses", pa.float64()),
+    ("savings_rate", pa.float64()),
+    ("monthly_milestone", pa.float64()),
+    ("goal_achievable", pa.bool_()),
+    ("recommended_essentials", pa.float64()),
+    ("recommended_discretionary", pa.float64()),
+    ("recommended_savings", pa.float64()),
+    ("actual_essentials", pa.float64()),
+    ("actual_discretionary", pa.float64()),
+    ("actual_savings", pa.float64()),
+    ("essentials_share", pa.float64()),
+    ("solution_1_monthly", pa.float64()),
+    ("solution_2_monthly", pa.float64()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+
+
+def analytics_row(username, timestamp, inputs, numbers):
+    """One row of SCHEMA from the inputs and numeric results of a submission (see history.numeric_results)."""
+    income = inputs.get("income")
+    recommended = numbers.get("recommended") or [None] * 3
+    actual = numbers.get("actual") or [None] * 3
+    return {
+        "username": username,
+        "ts": datetime.fromtimestamp(timestamp),
+        "income": income,
+        "saving": inputs.get("saving"),
+        "saving_target": inputs.get("saving_target"),
+        "saving_timeline": inputs.get("saving_timeline"),
+        "total_expenses": numbers.get("total_expenses"),
+        "savings_rate": numbers.get("savings_rate"),
+        "monthly_milestone": numbers.get("monthly_milestone"),
+        "goal_achievable": numbers.get("goal_achievable"),
+        "recommended_essentials": recommended[0],
+        "recommended_discretionary": recommended[1],
+        "recommended_savings": recommended[2],
+        "actual_essentials": actual[0],
+        "actual_discretionary": actual[1],
+        "actual_savings": actual[2],
+        "essentials_share": actual[0] / income if income and actual[0] is not None else None,
+        "solution_1_monthly": (numbers.get("solution_1") or [None])[0],
+        "solution_2_monthly": (numbers.get("solution_2") or [None])[0],
+    }
+
+
+def record_numbers(record):
+    """(inputs, numbers) of a stored user record, for users saved before the submission history existed."""
+    from history import numeric_results
+
+    income = record.get("income") or 0
+    numbers = numeric_results(
+        record.get("result") or {}, income, None, None, None,
+        record.get("vital_expenses") or {}, record.get("non_vital_expenses") or {},
+    )
+    return {"income": income}, numbers
+
+
+def latest_rows(table):
+    """The most recent row of every username in table."""
+    # Newest first, so the first row of each username is its latest
+    table = table.sort_by([("username", "ascending"), ("ts", "descending")])
+    _, first_rows = np.unique(table["username"].to_numpy(), return_index=True)
+    return table.take(first_rows)
+
+
+def _write_file(table, directory, name):
+    # Files starting with "." are ignored by readers until they are complete
+    temporary_path = os.path.join(directory, "." + name)
+    pq.write_table(table, temporary_path)
+    os.replace(temporary_path, os.path.join(directory, name))
+
+
+class AnalyticsStore:
+    """Append-only Parquet dataset of analytics rows, partitioned by month, and the latest row of every user."""
+
+    def __init__(self, path=ANALYTICS_PATH):
+        self.path = path
+        self.latest_path = os.path.join(path, LATEST_DIRECTORY)
+        # Next to the dataset, which backfill deletes
+        self.lock_path = path + ".lock"
+        # Compaction swaps files, so queries of this process wait for it
+        self._lock = threading.RLock()
+        self._compaction_thread = None
+
+    def _write(self, rows):
+        table = pa.Table.from_pylist(rows, schema=SCHEMA)
+        months = pc.strftime(table["ts"], format="%Y-%m")
+        for month in pc.unique(months).to_pylist():
+            part = table.filter(pc.equal(months, month))
+            directory = os.path.join(self.path, f"month={month}")
+            os.makedirs(directory, exist_ok=True)
+            _write_file(part, directory, f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet")
+
+    @contextmanager
+    def _dataset_lock(self, shared=False):
+        # Compaction and backfill delete files that other processes may be listing or reading
+        with self._lock, file_lock(self.lock_path, shared):
+            yield
+
+    def _write_latest(self, table):
+        """Replaces the latest row of the users of table by theirs when newer."""
+        os.makedirs(self.latest_path, exist_ok=True)
+        buckets = np.array([zlib.crc32(name.encode()) % LATEST_BUCKETS for name in table["username"].to_pylist()])
+        # Other processes rewrite the same files
+        with self._lock, file_lock(os.path.join(self.latest_path, ".lock")):
+            for bucket in np.unique(buckets).tolist():
+                name = f"bucket-{bucket:03d}.parquet"
+                path = os.path.join(self.latest_path, name)
+                rows = table.filter(pa.array(buckets == bucket))
+                if os.path.exists(path):
+                    rows = pa.concat_tables([pq.read_table(path, schema=SCHEMA), rows])
+                _write_file(latest_rows(rows), self.latest_path, name)
+
+    def append(self, username, inputs, numbers, timestamp=None):
+        """Adds the numeric results of one submission of username, which become its latest row."""
+        row = analytics_row(username, timestamp or time.time(), inputs, numbers)
+        self._write([row])
+        self._write_latest(pa.Table.from_pylist([row], schema=SCHEMA))
+
+    def dataset(self):
+        return ds.dataset(self.path, format="parquet", schema=SCHEMA, partitioning=PARTITIONING)
+
+    def latest_dataset(self):
+        return ds.dataset(self.latest_path, format="parquet", schema=SCHEMA)
+
+    def query(self, columns=None, filter=None, latest=False):
+        """Returns the rows matching filter (a pyarrow.compute expression) as a table of columns.
+
+        With latest=True only the most recent row of each user is considered: the filter is then
+        pushed down to the latest dataset.
+        """
+        if not os.path.isdir(self.path):
+            return SCHEMA.empty_table().select(columns or SCHEMA.names)
+        if latest and not os.path.isdir(self.latest_path):
+            # Datasets written before the latest rows were kept
+            with self._dataset_lock(shared=True):
+                table = self.dataset().to_table()
+            self._write_latest(latest_rows(table))
+        if latest:
+            with self._lock:
+                return self.latest_dataset().to_table(columns=columns, filter=filter)
+        with self._dataset_lock(shared=True):
+            return self.dataset().to_table(columns=columns, filter=filter)
+
+    def compact(self, min_files=COMPACTION_MIN_FILES):
+        """Merges the files of every partition holding more than min_files. Returns the number of partitions merged."""
+        if not os.path.isdir(self.path):
+            return 0
+        merged = 0
+        for partition in sorted(os.listdir(self.path)):
+            if partition == LATEST_DIRECTORY:
+                continue
+            directory = os.path.join(self.path, partition)
+            with self._dataset_lock():
+                # Listed, merged and deleted under the lock: another compaction or a backfill may be running
+                if not os.path.isdir(directory):
+                    continue
+                files = [name for name in os.listdir(directory) if name.endswith(".parquet") and not name.startswith(".")]
+                if len(files) <= min_files:
+                    continue
+                table = pa.concat_tables(pq.read_table(os.path.join(directory, name), schema=SCHEMA) for name in files)
+                table = table.sort_by([("username", "ascending"), ("ts", "ascending")])
+                _write_file(table, directory, f"compacted-{time.time_ns()}.parquet")
+                for old in files:
+                    os.remove(os.path.join(directory, old))
+            merged += 1
+        return merged
+
+    def start_compaction(self, interval=COMPACTION_INTERVAL):
+        """Starts a daemon thread running compact() every `interval` seconds (once per process)."""
+        if self._compaction_thread is None:
+            self._compaction_thread = start_periodic(self.compact, interval, "analytics-compaction")
+
+    def backfill(self, store, history):
+        """Rebuilds the dataset from the submission history, or the stored record of users without history."""
+        rows = []
+        for username in store.usernames():
+            entries = history.entries(username)
+            if entries:
+                rows.extend(analytics_row(username, entry["ts"], entry["inputs"], entry["results"]) for entry in entries)
+            else:
+                record = store.get(username)
+                if record:
+                    inputs, numbers = record_numbers(record)
+                    rows.append(analytics_row(username, time.time(), inputs, numbers))
+        with self._dataset_lock():
+            shutil.rmtree(self.path, ignore_errors=True)
+            if rows:
+                self._write(rows)
+                self._write_latest(latest_rows(pa.Table.from_pylist(rows, schema=SCHEMA)))
+        return len(rows)
+
+    def summary(self):
+        """A few aggregates over the latest result of every user."""
+        latest = self.query(["essentials_share", "goal_achievable", "savings_rate"], latest=True)
+        return {
+            "users": len(latest),
+            "average_essentials_share": pc.mean(latest["essentials_share"]).as_py(),
+            "goal_not_achievable": pc.sum(pc.invert(latest["goal_achievable"])).as_py() or 0,
+            "average_savings_rate": pc.mean(latest["savings_rate"]).as_py(),
+        }
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_analytics():
+    """Returns the process-wide analytics store, with its background compaction running."""
+    global _analytics
+    with _analytics_lock:
+        if _analytics is None:
+            _analytics = AnalyticsStore()
+            _analytics.start_compaction()
+        return _analytics
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Fin Genius analytics over every user's results.")
+    parser.add_argument("--backfill", action="store_true", help="rebuild the dataset from the history and records")
+    args = parser.parse_args(argv)
+    analytics = AnalyticsStore()
+    if args.backfill:
+        from history import SubmissionHistory
+        from storage import get_store
+
+        print(f"{analytics.backfill(get_store(), SubmissionHistory())} rows written to {analytics.path}")
+    for name, value in analytics.summary().items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    cli()
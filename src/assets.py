@@ -0,0 +1,89 @@
+import base64
+import functools
+import hashlib
+import io
+import os
+import threading
+
+from PIL import Image
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(SRC_DIR, "assets")
+# Streamlit serves <main script folder>/static at app/static when server.enableStaticServing is on
+STATIC_DIR = os.path.join(SRC_DIR, "static")
+STATIC_URL = "app/static"
+
+# Widths produced for every background, the largest being used above the last breakpoint
+BACKGROUND_WIDTHS = (640, 1280, 1920)
+WEBP_QUALITY = 80
+
+_variants = {}
+_lock = threading.Lock()
+
+
+def _encode(image, width):
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="WEBP", quality=WEBP_QUALITY, method=6)
+    return buffer.getvalue()
+
+
+def background_variants(name):
+    """Returns [(width, filename, data)] for assets/<name>, encoded once per process.
+
+    Each variant is written to the static folder under a content-hashed filename, so browsers
+    can cache it for good and a changed image gets a new URL.
+    """
+    with _lock:
+        if name in _variants:
+            return _variants[name]
+        with Image.open(os.path.join(ASSETS_DIR, name)) as source:
+            source.load()
+            image = source.convert("RGBA" if "A" in source.getbands() else "RGB")
+        stem = os.path.splitext(name)[0]
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        variants = []
+        for width in BACKGROUND_WIDTHS:
+            data = _encode(image, width)
+            filename = f"{stem}.{width}.{hashlib.sha1(data).hexdigest()[:10]}.webp"
+            path = os.path.join(STATIC_DIR, filename)
+            if not os.path.exists(path):
+                with open(path, "wb") as f:
+                    f.write(data)
+            variants.append((width, filename, data))
+        _variants[name] = variants
+        return variants
+
+
+def prepare_backgrounds(names):
+    """Encodes the given backgrounds up front (e.g. at app startup)."""
+    for name in names:
+        background_variants(name)
+
+
+@functools.lru_cache(maxsize=32)
+def background_css(name, selector=".stApp", static_serving=True):
+    """CSS setting assets/<name> as the background of selector (built once per arguments).
+
+    With static serving, media queries pick the variant that fits the viewport and the browser
+    fetches (and caches) only that one. Without it, the middle variant is inlined as a data URL.
+    """
+    variants = background_variants(name)
+    if not static_serving:
+        width, filename, data = variants[len(variants) // 2]
+        url = f"data:image/webp;base64,{base64.b64encode(data).decode()}"
+        return f"{selector} {{ background-image: url(\"{url}\"); background-size: cover; }}"
+    rules = []
+    previous_width = 0
+    for index, (width, filename, data) in enumerate(variants):
+        declaration = f"{selector} {{ background-image: url(\"{STATIC_URL}/{filename}\"); background-size: cover; }}"
+        if index == len(variants) - 1:
+            rules.append(f"@media (min-width: {previous_width + 1}px) {{ {declaration} }}")
+        elif index == 0:
+            rules.append(f"@media (max-width: {width}px) {{ {declaration} }}")
+        else:
+            rules.append(f"@media (min-width: {previous_width + 1}px) and (max-width: {width}px) {{ {declaration} }}")
+        previous_width = width
+    return "\n".join(rules)
@@ -0,0 +1,227 @@
+import io
+import contextlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import expert
+import periods
+
+# Column names used by evaluate_frame (same names as the arguments of expert.main)
+INCOME_COLUMN = "income"
+SAVING_COLUMN = "saving"
+TARGET_COLUMN = "saving_target"
+TIMELINE_COLUMN = "saving_timeline"
+GOAL_COLUMN = "goal_description"
+
+
+def _as_array(values, size=None):
+    array = np.asarray(values)
+    if array.ndim == 0 and size is not None:
+        array = np.full(size, array.item())
+    return array
+
+
+def _sequential_sum(columns, size):
+    """Sums expense columns one after the other, like sum(dict.values()) does for a single profile."""
+    total = np.zeros(size, dtype=np.int64)
+    for column in columns:
+        total = total + np.nan_to_num(_as_array(column, size))
+    return total
+
+
+def _add_months(now, months):
+    """Returns 'YYYY-MM' strings for the current month shifted by an array of months."""
+    return np.datetime_as_string(periods.add_months(periods.current_month(now), months), unit="M")
+
+
+def evaluate_arrays(income, saving, saving_target, saving_timeline, vital_expenses_data, non_vital_expenses_data, now=None):
+    """Runs the SavingsGoalTracker arithmetic over whole arrays of profiles in one pass.
+
+    vital_expenses_data and non_vital_expenses_data map a category name to an array of amounts
+    (NaN meaning the category was not selected). Returns a dict of numpy arrays.
+    """
+    now = now or datetime.now()
+    income = _as_array(income)
+    size = income.shape[0]
+    saving = _as_array(saving, size)
+    target = _as_array(saving_target, size)
+    timeline = _as_array(saving_timeline, size)
+    if np.any(timeline == 0):
+        raise ValueError(f"saving_timeline must not be 0 (rows {np.flatnonzero(timeline == 0).tolist()})")
+
+    vital_total = _sequential_sum(vital_expenses_data.values(), size)
+    non_vital_total = _sequential_sum(non_vital_expenses_data.values(), size)
+    total_expenses = vital_total + non_vital_total
+
+    # calculate_savings_rate (max(x, 0) keeps the int 0 when x is negative)
+    balance = income - total_expenses
+    savings_rate_clipped = balance < 0
+    savings_rate = np.where(savings_rate_clipped, 0, balance)
+
+    # feasibility_check
+    required_rate = target / timeline
+    monthly_milestone = (target - saving) / timeline
+    achievable_without_saving = savings_rate >= required_rate
+    achievable_with_saving = ~achievable_without_saving & (saving >= monthly_milestone)
+    goal_achievable = achievable_without_saving | achievable_with_saving
+    savings_exceeds_milestone = achievable_without_saving & (savings_rate > monthly_milestone)
+
+    # suggest_budget_adjustments
+    suggest_adjustments = ~goal_achievable
+    adjustable = suggest_adjustments & (savings_rate != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        months_needed = np.trunc(np.where(adjustable, (target - saving) / np.where(adjustable, savings_rate, 1), 0))
+
+    # calculate_rule / apply_50_30_20_rule
+    recommended = np.stack([0.5 * income, 0.3 * income, 0.2 * income], axis=1)
+    actual = np.stack([vital_total, non_vital_total, savings_rate], axis=1)
+    follows_rule = savings_rate >= recommended[:, 2]
+
+    return {
+        "savings_rate": savings_rate,
+        "savings_rate_clipped": savings_rate_clipped,
+        "goal_achievable": goal_achievable,
+        "goal_achievable_without_saving": achievable_without_saving,
+        "savings_exceeds_milestone": savings_exceeds_milestone,
+        "monthly_milestone": monthly_milestone,
+        "suggest_adjustments": suggest_adjustments,
+        "monthly_needed": monthly_milestone,
+        "additional_needed": monthly_milestone - savings_rate,
+        "solution_1_date": _add_months(now, timeline),
+        "solution_2_date": _add_months(now, months_needed),
+        "reduce_discretionary": non_vital_total > 0,
+        "recommended": recommended,
+        "actual": actual,
+        "follows_rule": follows_rule,
+        "discretionary_over_limit": non_vital_total > recommended[:, 1],
+        "essentials_over": vital_total > 1.5 * recommended[:, 0],
+        "discretionary_under_30": non_vital_total < 0.3 * recommended[:, 1],
+        "saving": saving,
+        "saving_target": target,
+    }
+
+
+def build_results(arrays, goal_description):
+    """Formats evaluated arrays into one SavingsGoalTracker.result dict per profile."""
+    rows = {key: value.tolist() for key, value in arrays.items()}
+    results = []
+    for i, goal in enumerate(goal_description):
+        result = {"goal_description": goal}
+        savings_rate = 0 if rows["savings_rate_clipped"][i] else rows["savings_rate"][i]
+        saving = rows["saving"][i]
+        target = rows["saving_target"][i]
+        result["savings_rate"] = expert.SAVINGS_RATE_MESSAGE.format(savings_rate)
+
+        if rows["goal_achievable_without_saving"][i]:
+            result["feasibility_check"] = expert.FEASIBLE_WITHOUT_SAVINGS_MESSAGE
+        elif rows["goal_achievable"][i]:
+            result["feasibility_check"] = expert.FEASIBLE_WITH_SAVINGS_MESSAGE
+        else:
+            result["feasibility_check"] = expert.NOT_FEASIBLE_MESSAGE
+
+        if rows["goal_achievable"][i]:
+            if saving == target:
+                result["milestone"] = expert.SAVINGS_MATCH_TARGET_MESSAGE
+            elif saving > target:
+                result["milestone"] = expert.SAVINGS_OVER_TARGET_MESSAGE.format(saving - target)
+            else:
+                result["milestone"] = expert.MILESTONE_MESSAGE.format(rows["monthly_milestone"][i])
+            if rows["savings_exceeds_milestone"][i]:
+                result["savings_exceeds_milestone"] = expert.SAVINGS_EXCEEDS_MILESTONE_MESSAGE
+        elif savings_rate == 0:
+            result["budget_adjustement"] = expert.IMPOSSIBLE_GOAL_MESSAGE
+        else:
+            monthly_needed = rows["monthly_needed"][i]
+            result["budget_adjustement_solution_1"] = [monthly_needed, rows["solution_1_date"][i]]
+            result["budget_adjustement_solution_2"] = [savings_rate, rows["solution_2_date"][i]]
+            reduce_discretionary = expert.REDUCE_DISCRETIONARY_MESSAGE if rows["reduce_discretionary"][i] else ""
+            result["budget_adjustement"] = expert.BUDGET_ADJUSTMENT_MESSAGE.format(
+                reduce_discretionary, monthly_needed, savings_rate, rows["additional_needed"][i], rows["solution_2_date"][i]
+            )
+
+        if rows["follows_rule"][i]:
+            message = expert.FOLLOW_RECOMMENDATIONS_SUCCESS_MESSAGE
+            if rows["discretionary_over_limit"][i]:
+                message += expert.LIMIT_DISCRETIONARY_MESSAGE
+            result["follow_recommendations_success"] = message
+        else:
+            result["follow_recommendations_warning"] = expert.FOLLOW_RECOMMENDATIONS_WARNING_MESSAGE
+        actual = rows["actual"][i]
+        if rows["savings_rate_clipped"][i]:
+            actual[2] = 0
+        result["rule_50_30_20"] = {"recommended": rows["recommended"][i], "actual": actual}
+        results.append(result)
+    return results
+
+
+def evaluate_batch(
+        vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline, now=None
+    ):
+    """Batch counterpart of expert.main: same arguments, but every value is an array of profiles."""
+    arrays = evaluate_arrays(income, saving, saving_target, saving_timeline, vital_expenses_data, non_vital_expenses_data, now)
+    size = arrays["savings_rate"].shape[0]
+    if goal_description is None or isinstance(goal_description, str):
+        goal_description = [goal_description or ""] * size
+    return build_results(arrays, list(goal_description))
+
+
+def split_expense_columns(columns):
+    """Splits the expense columns of a profile frame into vital and non-vital categories."""
+    fixed_columns = {INCOME_COLUMN, SAVING_COLUMN, TARGET_COLUMN, TIMELINE_COLUMN, GOAL_COLUMN}
+    expense_columns = [column for column in columns if column not in fixed_columns]
+    vital_columns = [column for column in expense_columns if expert.verifyExpenseIsMandatory(column)]
+    non_vital_columns = [column for column in expense_columns if not expert.verifyExpenseIsMandatory(column)]
+    return vital_columns, non_vital_columns
+
+
+def invalid_profiles(frame):
+    """Why each row of a profile frame cannot be evaluated, as a Series of messages (None for valid rows)."""
+    required = [INCOME_COLUMN, SAVING_COLUMN, TARGET_COLUMN, TIMELINE_COLUMN]
+    reasons = pd.Series(None, index=frame.index, dtype=object)
+    reasons[frame[TIMELINE_COLUMN].to_numpy() == 0] = "saving_timeline must not be 0"
+    # The first missing value of a row is the one reported
+    for column in reversed(required):
+        reasons[frame[column].isna().to_numpy()] = f"missing {column}"
+    return reasons
+
+
+def evaluate_frame(frame, now=None):
+    """Evaluates a DataFrame with one profile per row.
+
+    Expected columns: income, saving, saving_target, saving_timeline, an optional goal_description
+    and one column per expense category (named as in expert.taxonomy; unknown names count as non-vital).
+    Rows reported by invalid_profiles must be left out.
+    """
+    vital_columns, non_vital_columns = split_expense_columns(frame.columns)
+    vital_expenses_data = {column: frame[column].to_numpy() for column in vital_columns}
+    non_vital_expenses_data = {column: frame[column].to_numpy() for column in non_vital_columns}
+    goal_description = frame[GOAL_COLUMN].tolist() if GOAL_COLUMN in frame.columns else None
+    return evaluate_batch(
+        vital_expenses_data,
+        non_vital_expenses_data,
+        goal_description,
+        frame[INCOME_COLUMN].to_numpy(),
+        frame[TARGET_COLUMN].to_numpy(),
+        frame[SAVING_COLUMN].to_numpy(),
+        frame[TIMELINE_COLUMN].to_numpy(),
+        now,
+    )
+
+
+def parity_mismatches(frame):
+    """Runs every row of frame through both expert.main and evaluate_frame and returns the rows that differ."""
+    batch_results = evaluate_frame(frame)
+    vital_columns, non_vital_columns = split_expense_columns(frame.columns)
+    mismatches = []
+    for i, row in enumerate(frame.to_dict("records")):
+        vital = {column: row[column] for column in vital_columns if not pd.isna(row[column])}
+        non_vital = {column: row[column] for column in non_vital_columns if not pd.isna(row[column])}
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine_result = expert.main(
+                vital, non_vital, row.get(GOAL_COLUMN, ""), row[INCOME_COLUMN], row[TARGET_COLUMN], row[SAVING_COLUMN], row[TIMELINE_COLUMN]
+            )
+        if engine_result != batch_results[i]:
+            mismatches.append((i, engine_result, batch_results[i]))
+    return mismatches
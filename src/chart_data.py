@@ -0,0 +1,219 @@
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import periods
+from downsample import SeriesLevels
+from scenarios import surface_from_entry
+
+# Number of months shown by the savings trend chart
+TREND_MONTHS = 24
+# Ranges of the savings history chart, in months back from the current month (None: everything)
+HISTORY_RANGES = {"6 months": 6, "1 year": 12, "3 years": 36, "All": None}
+
+
+def generate_timeline(timeline_length) :
+    """The 'YYYY-MM' months following the current one."""
+    return periods.format_months(periods.month_range(periods.current_month(), timeline_length))
+
+
+def rule_50_30_20_frame(data):
+    chart_data = pd.DataFrame({
+        "Category": ["Essentials", "Discretionary", "Savings"],
+        "Actual": data["result"]["rule_50_30_20"]["actual"],
+        "Recommended": data["result"]["rule_50_30_20"]["recommended"]
+    })
+    # Melt DataFrame to long format for grouped bar chart
+    return chart_data.melt(id_vars="Category", value_vars=["Actual", "Recommended"],
+                            var_name="Type", value_name="Value")
+
+
+def saving_plans_frame(result):
+    # Extract the two saving plans and their respective lengths (in months from now)
+    current_month = periods.current_month()
+    length_1, length_2 = periods.months_between(current_month, [
+        result["budget_adjustement_solution_1"][1], result["budget_adjustement_solution_2"][1]
+    ]).clip(min=0).tolist()
+
+    # Determine the maximum length
+    max_length = max(length_1, length_2)
+
+    # Fill shorter arrays with 0
+    first_saving_plan_data = [result["budget_adjustement_solution_1"][0]] * length_1 + [0] * (max_length - length_1)
+    second_saving_plan_data = [result["budget_adjustement_solution_2"][0]] * length_2 + [0] * (max_length - length_2)
+
+    return pd.DataFrame(
+        {
+            "Month": generate_timeline(max_length),  # X-axis for months
+            "Needed savings per month": first_saving_plan_data,
+            "Current savings per month": second_saving_plan_data,
+        }
+    )
+
+
+def expenses_frame(expenses):
+    return pd.DataFrame(
+            {
+                "Category": expenses.keys(),
+                "Expense value": expenses.values(),
+            }
+        )
+
+
+def income_proportion_frame(data):
+    # Copy so the cached record is never modified
+    expenses = dict(data["non_vital_expenses"])
+    expenses.update(data["vital_expenses"])
+    match = re.search(r":\s*(\d+)", data["result"]["savings_rate"])
+    if match:
+        savings_rate = int(match.group(1))
+        expenses.update({"savings rate" : savings_rate})
+    chart_data = pd.DataFrame(
+            {
+                "Category": expenses.keys(),
+                "Expenses": expenses.values(),
+                "Income": [data["income"]] * len(expenses.keys())
+            }
+        )
+    chart_data["Proportion (%)"] = (chart_data["Expenses"] / chart_data["Income"]) * 100
+    return chart_data
+
+
+def savings_trend_frame(series):
+    return pd.DataFrame(
+        {
+            "Month": list(series.keys()),
+            "Current savings": [entry["inputs"]["saving"] for entry in series.values()],
+            "Savings rate": [entry["results"]["savings_rate"] for entry in series.values()],
+        }
+    )
+
+
+def savings_history_levels(entries, levels=None):
+    """Aggregation levels of the savings and savings rate of every submission of a user.
+
+    When levels is given, entries are the submissions made since and extend it.
+    """
+    x = np.array([datetime.fromtimestamp(entry["ts"]) for entry in entries], dtype="datetime64[s]")
+    series = {
+        "Current savings": [entry["inputs"]["saving"] for entry in entries],
+        "Savings rate": [entry["results"]["savings_rate"] for entry in entries],
+    }
+    return SeriesLevels(x, series) if levels is None else levels.extended(x, series)
+
+
+def savings_history_frame(levels, months=None, now=None):
+    """The downsampled points of the last `months` months (all of them if None), in long format."""
+    start = None
+    if months:
+        start = periods.add_months(periods.current_month(now), 1 - months).astype("datetime64[s]")
+    return pd.concat(
+        [pd.DataFrame({"Time": x, "Series": name, "Amount": y}) for name, (x, y) in levels.view(start=start).items()],
+        ignore_index=True,
+    )
+
+
+def build_chart_frames(record, series, history_levels=None, latest=None):
+    """Builds every DataFrame drawn by the Charts page for one user record.
+
+    The savings history (history_levels, from savings_history_levels) is viewed per range, and the
+    feasibility surface is computed around the latest submission.
+    """
+    result = record.get("result") or {}
+    frames = {
+        "rule_50_30_20": rule_50_30_20_frame(record),
+        "income_proportion": income_proportion_frame(record),
+    }
+    if result.get("budget_adjustement_solution_1") and result.get("budget_adjustement_solution_2"):
+        frames["saving_plans"] = saving_plans_frame(result)
+    if record.get("vital_expenses"):
+        frames["vital_expenses"] = expenses_frame(record["vital_expenses"])
+    if record.get("non_vital_expenses"):
+        frames["non_vital_expenses"] = expenses_frame(record["non_vital_expenses"])
+    if len(series) > 1:
+        frames["savings_trend"] = savings_trend_frame(series)
+    if history_levels is not None and len(history_levels) > 1:
+        frames["savings_history"] = history_levels
+    if latest is not None:
+        # Every (target date, monthly contribution) around the latest submission, in one vectorized pass
+        frames["feasibility_surface"] = surface_from_entry(latest)
+    return frames
+
+
+class ChartDataCache:
+    """Per-user cache of the stored record and its chart frames.
+
+    Entries are keyed on the record version reported by the store (and the current month), so a rerun that finds
+    the same version skips loading, parsing and rebuilding entirely. On a new version, the savings
+    history levels of the previous one are extended with the submissions made since, instead of
+    reading the whole history again. Cached frames are shared between sessions and must be treated
+    as read-only.
+    """
+
+    def __init__(self, max_users=1024):
+        self.max_users = max_users
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username, store, history):
+        """Returns (record, frames, version) for username; record and frames are None until the user has submitted.
+
+        A record without a result (only custom categories, say) has nothing to chart yet.
+        """
+        # The saving plan timelines start at the current month, so a new month also invalidates
+        version = (store.version(username), periods.format_months(periods.current_month()))
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return entry[1], entry[2], version
+            self.misses += 1
+            previous_history = entry[3] if entry is not None else None
+
+        record = store.get(username)
+        if not record or not record.get("result"):
+            return None, None, version
+        trend_start = periods.format_months(periods.add_months(periods.current_month(), 1 - TREND_MONTHS))
+        series = history.monthly_series(username, start_month=trend_start)
+        history_levels, last_ts = self._history_levels(username, history, previous_history)
+        frames = build_chart_frames(record, series, history_levels, history.latest(username))
+        with self._lock:
+            self._entries[username] = (version, record, frames, (history_levels, last_ts))
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return record, frames, version
+
+    @staticmethod
+    def _history_levels(username, history, previous):
+        """(levels, timestamp of the last submission) of username; only the submissions after previous are read."""
+        if previous is None or previous[1] is None:
+            entries = history.entries(username)
+            return savings_history_levels(entries), entries[-1]["ts"] if entries else None
+        levels, last_ts = previous
+        entries = history.entries_since(username, last_ts)
+        if not entries:
+            return previous
+        return savings_history_levels(entries, levels), entries[-1]["ts"]
+
+    def invalidate(self, username=None):
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "users": len(self._entries)}
+
+
+# Shared by every session of the process
+chart_data_cache = ChartDataCache()
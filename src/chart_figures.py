@@ -0,0 +1,165 @@
+import threading
+from collections import OrderedDict
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from scenarios import STATUS_LABELS
+
+# Line charts with more points than this are drawn with WebGL (scattergl) traces
+WEBGL_THRESHOLD = 1000
+
+
+def line_render_mode(chart_data):
+    return "webgl" if len(chart_data) > WEBGL_THRESHOLD else "svg"
+
+
+def saving_plans_figure(chart_data, title):
+    # Create a Plotly chart with axis labels
+    fig = px.line(
+        chart_data,
+        x="Month",
+        y=["Needed savings per month", "Current savings per month"],
+        labels={"value": "Savings Amount (TND)", "variable": "Saving Plan"},
+        title=title,
+        render_mode=line_render_mode(chart_data),
+    )
+    fig.update_yaxes(title_text="Savings Amount (TND)")  # Y-axis label
+    fig.update_xaxes(title_text="Months")             # X-axis label
+    return fig
+
+
+def expenses_figure(chart_data, title):
+    return px.bar(
+        chart_data,
+        x="Category",
+        y="Expense value",
+        title=title,
+        color="Category",
+        template="plotly_dark",
+        text_auto=True
+    )
+
+
+def income_proportion_figure(chart_data):
+    return px.pie(
+        chart_data,
+        names="Category",
+        values="Proportion (%)",
+        title="Income Proportion by Category",
+        color_discrete_sequence=px.colors.sequential.RdBu
+    )
+
+
+def savings_trend_figure(chart_data):
+    return px.line(
+        chart_data,
+        x="Month",
+        y=["Current savings", "Savings rate"],
+        labels={"value": "Amount (TND)", "variable": "Series"},
+        markers=True,
+        render_mode=line_render_mode(chart_data),
+    )
+
+
+def savings_history_figure(chart_data):
+    return px.line(
+        chart_data,
+        x="Time",
+        y="Amount",
+        color="Series",
+        labels={"Amount": "Amount (TND)"},
+        render_mode=line_render_mode(chart_data),
+    )
+
+
+def feasibility_surface_figure(surface):
+    # One discrete color per feasibility_check verdict
+    colors = ["#d9534f", "#f0ad4e", "#5cb85c"]
+    colorscale = [[bound, color] for i, color in enumerate(colors) for bound in (i / 3, (i + 1) / 3)]
+    fig = go.Figure(go.Heatmap(
+        z=surface["status"],
+        x=surface["contributions"],
+        y=surface["deadline_labels"],
+        customdata=surface["shortfall"],
+        zmin=-0.5,
+        zmax=2.5,
+        colorscale=colorscale,
+        colorbar={"tickvals": list(STATUS_LABELS), "ticktext": list(STATUS_LABELS.values())},
+        hovertemplate="Deadline %{y}<br>Saving %{x:.0f} TND per month<br>Milestone gap %{customdata:.2f} TND<extra></extra>",
+    ))
+    savings_rate, timeline = surface["current"]
+    fig.add_trace(go.Scatter(
+        x=[savings_rate],
+        y=[surface["deadline_labels"][timeline - 1]],
+        mode="markers",
+        marker={"symbol": "x", "size": 12, "color": "black"},
+        name="Your plan",
+        hovertemplate="Your plan<extra></extra>",
+    ))
+    fig.update_layout(
+        xaxis_title="Monthly contribution (TND)", yaxis_title="Target date", showlegend=False
+    )
+    return fig
+
+
+def rule_50_30_20_figure(data_melted):
+    return px.bar(
+        data_melted,
+        x="Category",
+        y="Value",
+        color="Type",
+        barmode="group",  # Group bars side by side
+        title="Comparison of Actual vs Recommended Values",
+        labels={"Value": "Amount (DNT)"},
+        template="plotly_dark",
+        text_auto=True
+    )
+
+
+class FigureCache:
+    """LRU cache of the serialized Plotly figures keyed by (username, record version, chart type).
+
+    Building a figure through plotly.express is the expensive part of a Charts rerun, so each
+    figure is built once per record version and kept as its JSON. Every get() returns a new
+    figure parsed from that JSON (about 30x cheaper than building it), so a session can change
+    its figure without affecting the others.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username, version, chart_type, build):
+        """Returns a new figure from the cached JSON, calling build() to create it on a miss."""
+        key = (username, version, chart_type)
+        with self._lock:
+            figure_json = self._entries.get(key)
+            if figure_json is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if figure_json is not None:
+            return pio.from_json(figure_json)
+        with self._lock:
+            self.misses += 1
+        figure = build()
+        # The built figure goes to this caller only: the cache keeps its JSON
+        figure_json = figure.to_json()
+        with self._lock:
+            self._entries[key] = figure_json
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return figure
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+# Shared by every session of the process
+figure_cache = FigureCache()
@@ -0,0 +1,131 @@
+import itertools
+
+from experta import Fact
+from experta.fieldconstraint import W
+
+
+class _WorkingMemory:
+    """Stands in for the engine inside rule bodies: they only write `result` and `declare` facts."""
+
+    def __init__(self):
+        self.result = {}
+        self.facts = []
+        # Field name -> facts having that field, so a pattern only scans the facts it can match
+        self.facts_by_field = {}
+        self._fact_ids = set()
+
+    def declare(self, *facts):
+        for fact in facts:
+            fields = {key: value for key, value in fact.items() if not Fact.is_special(key)}
+            # Like experta's FactList, a fact equal to a declared one is ignored
+            fact_id = (fact.__class__, frozenset((key, _hashable(value)) for key, value in fields.items()))
+            if fact_id in self._fact_ids:
+                continue
+            self._fact_ids.add(fact_id)
+            # Fact ids start at 1, 0 being experta's InitialFact
+            entry = (len(self.facts) + 1, fact.__class__, fields)
+            self.facts.append(entry)
+            for key in fields:
+                self.facts_by_field.setdefault(key, []).append(entry)
+
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return frozenset((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+class CompiledRule:
+    """The patterns of one rule, reduced to field tests and variable bindings, and its undecorated body."""
+
+    def __init__(self, rule):
+        self.name = rule._wrapped.__name__
+        self.salience = rule.salience
+        self.function = rule._wrapped
+        self.patterns = []
+        for pattern in rule:
+            if not isinstance(pattern, Fact):
+                raise TypeError(f"Rule {self.name}: only Fact patterns can be compiled, got {pattern!r}")
+            tests, bindings = [], []
+            for key, value in pattern.items():
+                if type(value) is W:
+                    if value.__bind__ is not None:
+                        bindings.append((key, value.__bind__))
+                    else:
+                        tests.append((key, _ANY))
+                elif Fact.is_special(key) or hasattr(value, "__bind__"):
+                    raise TypeError(f"Rule {self.name}: unsupported constraint {key}={value!r}")
+                else:
+                    tests.append((key, value))
+            self.patterns.append((pattern.__class__, tests, bindings))
+        self.fields = {key for _, tests, bindings in self.patterns for key, _ in tests + bindings}
+
+    def activations(self, memory):
+        """Yields (fact ids, context) for every combination of declared facts matching the patterns."""
+        candidates = []
+        for pattern_class, tests, bindings in self.patterns:
+            keys = [key for key, _ in tests + bindings]
+            facts = memory.facts_by_field.get(keys[0], []) if keys else memory.facts
+            candidates.append([
+                (fact_id, fields) for fact_id, fact_class, fields in facts
+                if fact_class is pattern_class
+                and all(key in fields for key, _ in bindings)
+                and all(key in fields and (value is _ANY or fields[key] == value) for key, value in tests)
+            ])
+        for combination in itertools.product(*candidates):
+            context = {}
+            for (pattern_class, tests, bindings), (fact_id, fields) in zip(self.patterns, combination):
+                for key, variable in bindings:
+                    if variable in context and context[variable] != fields[key]:
+                        break
+                    context[variable] = fields[key]
+                else:
+                    continue
+                break
+            else:
+                yield tuple(fact_id for fact_id, _ in combination), context
+
+
+_ANY = object()
+
+
+class CompiledRuleSet:
+    """Plain-Python evaluation of the rules of a KnowledgeEngine class, without the Rete network.
+
+    The rule patterns are compiled once into field tests and bindings; a run then declares facts into
+    a list, matches them against the patterns and calls the undecorated rule bodies directly.
+    Activations are fired in the order of experta's DepthStrategy (highest salience first, then the
+    activation matching the most recently declared facts), so the result is the one the engine gives.
+    Only rules made of Fact patterns with literal values and MATCH bindings can be compiled.
+    """
+
+    def __init__(self, engine_class):
+        self.rules = [CompiledRule(rule) for rule in engine_class().get_rules()]
+
+    def run(self, facts):
+        """Declares facts (in order, like KnowledgeEngine.declare), runs the rules and returns the result."""
+        memory = _WorkingMemory()
+        memory.declare(*facts)
+        agenda = []
+        matched = 0
+        sequence = itertools.count()
+        while True:
+            # Only combinations involving a fact declared since the last match are new activations
+            if len(memory.facts) > matched:
+                new_fields = {key for _, _, fields in memory.facts[matched:] for key in fields}
+                for rule in self.rules:
+                    if rule.fields and rule.fields.isdisjoint(new_fields):
+                        continue
+                    for fact_ids, context in rule.activations(memory):
+                        if max(fact_ids, default=0) > matched:
+                            key = (rule.salience, sorted(fact_ids, reverse=True), next(sequence))
+                            agenda.append((key, rule, context))
+                matched = len(memory.facts)
+            if not agenda:
+                return memory.result
+            agenda.sort(key=lambda activation: activation[0])
+            _, rule, context = agenda.pop()
+            rule.function(memory, **context)
+
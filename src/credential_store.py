@@ -0,0 +1,105 @@
+import atexit
+import copy
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import yaml
+from yaml.loader import SafeLoader
+
+# Changes made within this window (seconds) are written together
+COALESCE_DELAY = 1.0
+# Copies of the config retried when a session changes it meanwhile
+SNAPSHOT_ATTEMPTS = 20
+
+
+class CredentialStore:
+    """In-memory copy of the authenticator config with dirty-tracked, atomic, coalesced writes.
+
+    The YAML file is parsed once. streamlit_authenticator modifies `config` in place (registration,
+    password reset, login attempts); save_if_changed() then writes the file only if the config
+    differs from what was last written, after COALESCE_DELAY so bursts of changes share one write.
+    Sessions make their changes inside editing(), which holds the lock the writer takes, so a write
+    never sees half of a change; a change made outside of it only makes the copy be retried.
+    """
+
+    def __init__(self, path, coalesce_delay=COALESCE_DELAY):
+        self.path = path
+        self.coalesce_delay = coalesce_delay
+        self.writes = 0
+        self._lock = threading.RLock()
+        self._timer = None
+        with open(path) as file:
+            self.config = yaml.load(file, Loader=SafeLoader)
+        self._saved = copy.deepcopy(self.config)
+        atexit.register(self.flush)
+
+    @contextmanager
+    def editing(self):
+        """Holds the store lock while the caller modifies the config (yielded)."""
+        with self._lock:
+            yield self.config
+
+    def _snapshot(self):
+        # A dict changed by another thread while it is copied raises RuntimeError: copy it again
+        for _ in range(SNAPSHOT_ATTEMPTS - 1):
+            try:
+                return copy.deepcopy(self.config)
+            except RuntimeError:
+                time.sleep(0.001)
+        return copy.deepcopy(self.config)
+
+    def is_dirty(self):
+        with self._lock:
+            return self._snapshot() != self._saved
+
+    def save_if_changed(self):
+        """Schedules a write if the config changed since the last one. Returns True if a write is pending."""
+        with self._lock:
+            if self._timer is not None:
+                return True
+            if self._snapshot() == self._saved:
+                return False
+            self._timer = threading.Timer(self.coalesce_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+            return True
+
+    def flush(self):
+        """Writes the config now if it changed (temp file + rename, so the file is never half written)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            snapshot = self._snapshot()
+            if snapshot == self._saved:
+                return False
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(prefix=".config-", suffix=".yaml", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as file:
+                    yaml.dump(snapshot, file, default_flow_style=False)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temp_path, self.path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            self._saved = snapshot
+            self.writes += 1
+            return True
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_credential_store(path):
+    """Returns the process-wide store of path, so reruns and sessions share one parsed config."""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = CredentialStore(path)
+        return _stores[path]
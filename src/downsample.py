@@ -0,0 +1,147 @@
+import numpy as np
+
+# Points per series sent to the browser, whatever the length of the history
+MAX_POINTS = 500
+# Each aggregation level keeps the min and max of buckets of this many points (4x fewer points per level)
+LEVEL_BUCKET = 8
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points keeping the visual shape of (x, y).
+
+    The first and last points are kept; every other bucket keeps the point forming the largest
+    triangle with the point kept in the previous bucket and the average of the next bucket.
+    """
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, size - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else size
+        next_x = x[end:next_end].mean() if next_end > end else x[-1]
+        next_y = y[end:next_end].mean() if next_end > end else y[-1]
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return indices
+
+
+def minmax_indices(y, bucket):
+    """Indices of the min and max of every `bucket` consecutive points, in order (peaks survive aggregation)."""
+    size = len(y)
+    if size <= 2 * bucket:
+        return np.arange(size)
+    return _block_minmax(y, bucket)
+
+
+def _block_minmax(y, bucket):
+    size = len(y)
+    full = size - size % bucket
+    blocks = y[:full].reshape(-1, bucket)
+    offsets = np.arange(0, full, bucket)
+    low = offsets + blocks.argmin(axis=1)
+    high = offsets + blocks.argmax(axis=1)
+    indices = np.concatenate([low, high, np.arange(full, size)])
+    return np.unique(indices)
+
+
+def _numeric_axis(x):
+    # LTTB measures areas on a numeric axis
+    return x.astype("datetime64[ns]").astype(np.int64) if np.issubdtype(x.dtype, np.datetime64) else x
+
+
+class SeriesLevels:
+    """Precomputed min/max aggregation levels of time series sharing one x axis.
+
+    Level 0 is the raw data and each level has about 4x fewer points than the previous one, so a
+    view of any range reads at most ~4 * max_points points of the finest suitable level and reduces
+    them with LTTB: the payload stays bounded whatever the amount of history.
+    """
+
+    def __init__(self, x, series, bucket=LEVEL_BUCKET, max_points=MAX_POINTS):
+        order = np.argsort(x, kind="stable")
+        self.x = np.asarray(x)[order]
+        self._x_numbers = _numeric_axis(self.x)
+        self.bucket = bucket
+        self.max_points = max_points
+        self.levels = {}
+        for name, values in series.items():
+            values = np.asarray(values, dtype=float)[order]
+            self.levels[name] = (values, self._build_levels(values))
+
+    def _build_levels(self, values, previous=None):
+        """Index arrays of every level of values; the blocks already reduced in previous levels are reused."""
+        levels = [np.arange(len(values))]
+        while len(levels[-1]) > self.max_points:
+            below = levels[-1]
+            depth = len(levels)
+            kept = 0
+            if previous is not None and depth < len(previous) and len(below) > 2 * self.bucket:
+                # Full blocks of the level below that are unchanged reduce to the same points
+                old_below = previous[depth - 1]
+                changed = np.flatnonzero(old_below[:len(below)] != below[:len(old_below)])
+                kept = (changed[0] if len(changed) else min(len(old_below), len(below))) // self.bucket * self.bucket
+            if kept:
+                head = previous[depth]
+                if kept < len(old_below):
+                    head = head[head < old_below[kept]]
+                tail = below[kept:]
+                reduced = np.concatenate([head, tail[_block_minmax(values[tail], self.bucket)]])
+            else:
+                reduced = below[minmax_indices(values[below], self.bucket)]
+            if len(reduced) >= len(below):
+                break
+            levels.append(reduced)
+        return levels
+
+    def extended(self, x, series):
+        """A new SeriesLevels with the points (x, {name: values}) added to these ones.
+
+        Points after the current ones (the usual case: new submissions) only reduce the blocks at
+        the end of each level; others rebuild the levels.
+        """
+        order = np.argsort(x, kind="stable")
+        x = np.asarray(x)[order]
+        if len(self.x) and len(x) and x[0] < self.x[-1]:
+            return SeriesLevels(
+                np.concatenate([self.x, x]),
+                {name: np.concatenate([values, np.asarray(series[name], dtype=float)[order]])
+                 for name, (values, _) in self.levels.items()},
+                self.bucket, self.max_points,
+            )
+        levels = SeriesLevels.__new__(SeriesLevels)
+        levels.x = np.concatenate([self.x, x])
+        levels._x_numbers = _numeric_axis(levels.x)
+        levels.bucket = self.bucket
+        levels.max_points = self.max_points
+        levels.levels = {}
+        for name, (values, previous) in self.levels.items():
+            values = np.concatenate([values, np.asarray(series[name], dtype=float)[order]])
+            levels.levels[name] = (values, levels._build_levels(values, previous))
+        return levels
+
+    def __len__(self):
+        return len(self.x)
+
+    def view(self, start=None, end=None, max_points=None):
+        """Returns {name: (x, y)} for the points between start and end (inclusive), at most max_points per series."""
+        max_points = max_points or self.max_points
+        low = 0 if start is None else np.searchsorted(self.x, start, side="left")
+        high = len(self.x) if end is None else np.searchsorted(self.x, end, side="right")
+        view = {}
+        for name, (values, levels) in self.levels.items():
+            for level in levels:
+                in_range = level[np.searchsorted(level, low):np.searchsorted(level, high)]
+                if len(in_range) <= 4 * max_points:
+                    break
+            keep = in_range[lttb(self._x_numbers[in_range], values[in_range], max_points)]
+            view[name] = (self.x[keep], values[keep])
+        return view
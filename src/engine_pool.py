@@ -0,0 +1,68 @@
+import threading
+from contextlib import contextmanager
+
+
+class EnginePool:
+    """Thread-safe pool of pre-built knowledge engines.
+
+    Building a KnowledgeEngine compiles its Rete network, which is the expensive part of a run.
+    Engines are built once by `factory`, checked out, reset and handed back for reuse.
+    At most `max_size` idle engines are kept; when every pooled engine is busy, a temporary
+    one is built (counted as a miss) instead of blocking the caller.
+    """
+
+    def __init__(self, factory, max_size=8):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.factory = factory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Returns a freshly reset engine, reusing an idle one when possible."""
+        with self._lock:
+            if self._idle:
+                engine = self._idle.pop()
+                self.hits += 1
+            else:
+                engine = None
+                self.misses += 1
+        if engine is None:
+            engine = self.factory()
+        engine.reset()
+        return engine
+
+    def release(self, engine):
+        """Hands an engine back to the pool (dropped if the pool is already full)."""
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append(engine)
+
+    @contextmanager
+    def checkout(self):
+        engine = self.acquire()
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+    def prefill(self, count=None):
+        """Builds engines up front so the first requests are hits."""
+        count = self.max_size if count is None else min(count, self.max_size)
+        engines = [self.factory() for _ in range(count)]
+        with self._lock:
+            for engine in engines:
+                if len(self._idle) < self.max_size:
+                    self._idle.append(engine)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+            }
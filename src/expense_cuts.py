@@ -0,0 +1,130 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Categories considered by the optimizer (the ones with the most room to cut); 2**16 candidate sets at most
+MAX_CATEGORIES = 16
+MAX_PLANS = 5
+# Share of each category kept when discretionary spending is already under 30% of its 50/30/20 allowance
+LEAN_MIN_FRACTION = 0.5
+
+ESSENTIALS_OVER_NOTE = (
+    "Your essential expenses are over 150% of the 50/30/20 recommendation: "
+    "cutting discretionary spending helps, but reviewing essentials would help more."
+)
+DISCRETIONARY_UNDER_30_NOTE = (
+    "Your discretionary spending is already low, so no category is cut by more than half."
+)
+
+
+def rule_signals(income, vital_total, non_vital_total):
+    """The essentials_over and discretionary_under_30 signals declared by calculate_rule."""
+    return {
+        "essentials_over": vital_total > 1.5 * (0.5 * income),
+        "discretionary_under_30": non_vital_total < 0.3 * (0.3 * income),
+    }
+
+
+def required_increase(income, saving, saving_target, saving_timeline, vital_total, non_vital_total, use_current_savings=False):
+    """Monthly amount the savings rate misses for the goal to be feasible (<= 0 when it already is).
+
+    By default this is the feasibility_check condition (target / timeline); with use_current_savings
+    the current savings count, as in the monthly amount given by suggest_budget_adjustments.
+    """
+    savings_rate = max(income - vital_total - non_vital_total, 0)
+    needed = (saving_target - saving if use_current_savings else saving_target) / saving_timeline
+    return needed - savings_rate
+
+
+@lru_cache(maxsize=MAX_CATEGORIES + 1)
+def _subset_masks(count):
+    """0/1 matrix of every non-empty subset of count categories (one row per subset)."""
+    masks = (np.arange(1, 2 ** count)[:, None] >> np.arange(count)[None, :]) & 1
+    masks.setflags(write=False)
+    return masks
+
+
+def optimize_cuts(
+        income, saving, saving_target, saving_timeline, vital_expenses_data, non_vital_expenses_data,
+        minimums=None, use_current_savings=False, max_plans=MAX_PLANS
+    ):
+    """Ranked plans of cuts in non_vital_expenses_data that make the goal feasible by saving_timeline.
+
+    Each category can go down to its minimum (minimums maps a category to an amount, 0 by default).
+    Plans cut as few categories as possible: every set of categories is scored at once (a 0/1
+    matrix times the room of each category), the smallest feasible sets are kept and the needed
+    amount is spread over a set in proportion to the room of its categories. Plans are ranked by
+    the largest share taken from one category, then by the room the set has left.
+    """
+    non_vital_expenses_data = non_vital_expenses_data or {}
+    vital_total = sum((vital_expenses_data or {}).values())
+    non_vital_total = sum(non_vital_expenses_data.values())
+    signals = rule_signals(income, vital_total, non_vital_total)
+    needed = required_increase(
+        income, saving, saving_target, saving_timeline, vital_total, non_vital_total, use_current_savings
+    )
+    notes = []
+    if signals["essentials_over"]:
+        notes.append(ESSENTIALS_OVER_NOTE)
+    if signals["discretionary_under_30"]:
+        notes.append(DISCRETIONARY_UNDER_30_NOTE)
+    # A deficit must be covered before anything goes to savings
+    needed = needed + max(vital_total + non_vital_total - income, 0)
+    summary = {"needed": max(float(needed), 0.0), "signals": signals, "notes": notes, "plans": []}
+    if needed <= 0:
+        summary["feasible"] = True
+        return summary
+
+    minimums = minimums or {}
+    categories = list(non_vital_expenses_data)
+    amounts = np.array([non_vital_expenses_data[category] for category in categories], dtype=float)
+    floors = np.array([minimums.get(category, 0) for category in categories], dtype=float)
+    if signals["discretionary_under_30"]:
+        floors = np.maximum(floors, LEAN_MIN_FRACTION * amounts)
+    room = np.maximum(amounts - floors, 0)
+    summary["max_cut"] = float(room.sum())
+    if room.sum() < needed - 1e-9:
+        summary["feasible"] = False
+        summary["shortfall"] = float(needed - room.sum())
+        return summary
+    summary["feasible"] = True
+
+    order = np.argsort(-room, kind="stable")
+    # The fewest categories that can cover needed are the ones with the most room
+    smallest = int(np.searchsorted(np.cumsum(room[order]), needed - 1e-9)) + 1
+    if smallest > MAX_CATEGORIES:
+        # Too many categories to enumerate the sets: one plan over the categories with the most room
+        plans = [order[:smallest]]
+    else:
+        order = order[:MAX_CATEGORIES]
+        order = order[room[order] > 0]
+        masks = _subset_masks(len(order))
+        set_room = masks @ room[order]
+        candidates = np.flatnonzero((set_room >= needed - 1e-9) & (masks.sum(axis=1) == smallest))
+
+        # Spread over the set in proportion to room: the same share of every category's room is cut
+        shares = needed / set_room[candidates]
+        cut_fraction = shares[:, None] * masks[candidates] * (room[order] / np.where(amounts[order] > 0, amounts[order], 1))[None, :]
+        largest_cut = cut_fraction.max(axis=1)
+        ranking = candidates[np.lexsort((-set_room[candidates], largest_cut))][:max_plans]
+        plans = [order[masks[candidate].astype(bool)] for candidate in ranking]
+
+    for selected in plans:
+        share = needed / room[selected].sum()
+        cuts = {categories[index]: round(float(share * room[index]), 2) for index in selected}
+        summary["plans"].append({
+            "cuts": cuts,
+            "new_expenses": {
+                category: round(float(amount - cuts.get(category, 0)), 2)
+                for category, amount in non_vital_expenses_data.items()
+            },
+            "categories_cut": smallest,
+            "total_cut": round(float(needed), 2),
+            "largest_cut_share": round(float(max(cuts[c] / non_vital_expenses_data[c] for c in cuts)), 4),
+        })
+    return summary
+
+
+def optimize_cuts_batch(users, **options):
+    """Runs optimize_cuts for many users: `users` maps a username to the arguments of optimize_cuts (a dict)."""
+    return {username: optimize_cuts(**arguments, **options) for username, arguments in users.items()}
@@ -1,6 +1,10 @@
 from experta import *
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+from engine_pool import EnginePool
+from compiled_rules import CompiledRuleSet
+from taxonomy import load_taxonomy
+from metrics import metrics
+import periods
+import time
 
 # -- USER INPUTS --
 # We're on the fourth of december
@@ -50,6 +54,26 @@ non_mandatory_expenses = [
     "events",
 ]
 
+# Hierarchy, aliases and user-defined categories on top of the two lists above (see taxonomy.py)
+taxonomy = load_taxonomy(vital_expenses, non_mandatory_expenses)
+
+# Messages written into SavingsGoalTracker.result (shared with the batch evaluator)
+SAVINGS_RATE_MESSAGE = "Calculated savings rate: {}"
+FEASIBLE_WITHOUT_SAVINGS_MESSAGE = "Goal is achievable without considering your current savings."
+FEASIBLE_WITH_SAVINGS_MESSAGE = "Goal is achievable only when considering your current savings."
+NOT_FEASIBLE_MESSAGE = "Goal is not achievable within the given timeline. Consider budget adjustments."
+SAVINGS_EXCEEDS_MILESTONE_MESSAGE = "You can save more than the required amount."
+SAVINGS_MATCH_TARGET_MESSAGE = """Your savings match exactly your savings target. No need for further savings. \n"""
+SAVINGS_OVER_TARGET_MESSAGE = """You have enough current savings to satisfy your goal. You will save {:.2f} TND . \n"""
+MILESTONE_MESSAGE = "To reach your goal, save {:.2f} per month."
+IMPOSSIBLE_GOAL_MESSAGE = """This saving goal is impossible. Consider being more realistic or maybe steal a bank 😏. \n"""
+REDUCE_DISCRETIONARY_MESSAGE = "Consider reducing discretionary expenses to increase your savings rate."
+BUDGET_ADJUSTMENT_MESSAGE = """{} You need to monthly save {:.2f}, but you are only saving {:.2f} that means you need to save an additional {:.2f} per month.
+            Otherwise, your goal will be reached, approximately, in {}."""
+FOLLOW_RECOMMENDATIONS_SUCCESS_MESSAGE = "Your actual distribution is better than the one recommended by the 50/30/20 rule, Good job! \n"
+LIMIT_DISCRETIONARY_MESSAGE = "You can save even more if you limit your discretionary expenses."
+FOLLOW_RECOMMENDATIONS_WARNING_MESSAGE = "We recommend you to follow the 50/30/20 rule to have more savings."
+
 class Finances(Fact):
     """Fact containing information about the financial situation."""
     pass
@@ -59,12 +83,46 @@ class SavingsGoalTracker(KnowledgeEngine):
         super().__init__()
         self.result = {}
 
+    def reset(self, **kwargs):
+        """Clears facts, agenda and result so a pooled engine can be reused."""
+        super().reset(**kwargs)
+        self.result = {}
+
+    def run(self, steps=float('inf')):
+        """Runs the engine, timing each rule and the fact matching when metrics are enabled."""
+        if not metrics.enabled:
+            return super().run(steps)
+        # Same loop as KnowledgeEngine.run, with the match and fire phases timed separately
+        run_start = time.perf_counter()
+        agenda_size = 0
+        self.running = True
+        while steps > 0 and self.running:
+            match_start = time.perf_counter()
+            added, removed = self.get_activations()
+            self.strategy.update_agenda(self.agenda, added, removed)
+            metrics.observe("fin_genius_engine_match_seconds", time.perf_counter() - match_start)
+            agenda_size = max(agenda_size, len(self.agenda.activations))
+
+            activation = self.agenda.get_next()
+            if activation is None:
+                break
+            steps -= 1
+            rule_name = activation.rule.__name__
+            rule_start = time.perf_counter()
+            activation.rule(self, **{k: v for k, v in activation.context.items() if not k.startswith('__')})
+            metrics.observe("fin_genius_rule_seconds", time.perf_counter() - rule_start, rule=rule_name)
+            metrics.inc("fin_genius_rule_fires_total", rule=rule_name)
+        self.running = False
+        metrics.observe("fin_genius_engine_run_seconds", time.perf_counter() - run_start)
+        metrics.observe("fin_genius_engine_agenda_size", agenda_size)
+        metrics.observe("fin_genius_engine_facts", len(self.facts))
+
     @Rule(Fact(goal_description=MATCH.goal), Fact(monthly_income=MATCH.income), Fact(monthly_expenses=MATCH.expenses))
     def calculate_savings_rate(self, goal, income, expenses):
         """Calculates the monthly savings rate."""
         savings_rate = max(income - expenses,0)
         self.result["goal_description"]=goal
-        self.result["savings_rate"] = (f"Calculated savings rate: {savings_rate}")
+        self.result["savings_rate"] = SAVINGS_RATE_MESSAGE.format(savings_rate)
         self.declare(Fact(savings_rate=savings_rate))
 
     @Rule(
@@ -80,14 +138,14 @@ class SavingsGoalTracker(KnowledgeEngine):
             self.declare(Fact(goal_achievable=True))
             self.declare(Fact(goal_achievable_without_saving=True))
             self.declare(Fact(suggest_adjustments=False))
-            self.result["feasibility_check"]="Goal is achievable without considering your current savings."
+            self.result["feasibility_check"]=FEASIBLE_WITHOUT_SAVINGS_MESSAGE
         elif savings >= (target-savings)/timeline:
             self.declare(Fact(goal_achievable=True))
-            self.result["feasibility_check"]="Goal is achievable only when considering your current savings."
+            self.result["feasibility_check"]=FEASIBLE_WITH_SAVINGS_MESSAGE
         else:
             self.declare(Fact(suggest_adjustments=True))
             self.declare(Fact(goal_achievable=False))
-            self.result["feasibility_check"]=("Goal is not achievable within the given timeline. Consider budget adjustments.")
+            self.result["feasibility_check"]=NOT_FEASIBLE_MESSAGE
 
     @Rule(Fact(goal_achievable_without_saving=True), 
           Fact(target_amount=MATCH.target), 
@@ -107,19 +165,19 @@ class SavingsGoalTracker(KnowledgeEngine):
     @Rule(Fact(savings_exceeds_milestone=True))
     def savings_exceeds_milestone(self):
         """Savings exceeds the milestone."""
-        self.result["savings_exceeds_milestone"]="You can save more than the required amount."
+        self.result["savings_exceeds_milestone"]=SAVINGS_EXCEEDS_MILESTONE_MESSAGE
 
     @Rule(Fact(goal_achievable=True), Fact(target_amount=MATCH.target), Fact(timeline=MATCH.timeline), Fact(current_savings=MATCH.savings))
     def generate_milestones(self, target, timeline, savings):
         """Generates monthly milestones to track progress."""
         if(savings == target):
-            self.result["milestone"]= f"""Your savings match exactly your savings target. No need for further savings. \n"""
+            self.result["milestone"]= SAVINGS_MATCH_TARGET_MESSAGE
         elif(savings > target):
-            self.result["milestone"]= f"""You have enough current savings to satisfy your goal. You will save {savings-target:.2f} TND . \n"""
+            self.result["milestone"]= SAVINGS_OVER_TARGET_MESSAGE.format(savings-target)
         else:
             monthly_milestone = (target-savings) / timeline
             self.declare(Fact(monthly_milestone=monthly_milestone))
-            self.result["milestone"]= (f"To reach your goal, save {monthly_milestone:.2f} per month.")
+            self.result["milestone"]= MILESTONE_MESSAGE.format(monthly_milestone)
 
     # @Rule(Fact(current_savings=MATCH.savings), Fact(monthly_milestone=MATCH.milestone))
     # def track_progress(self, savings, milestone):
@@ -152,31 +210,31 @@ class SavingsGoalTracker(KnowledgeEngine):
         """Suggests budget adjustments to meet savings goals."""
         
         if(savings_rate == 0) :
-            self.result["budget_adjustement"]= f"""This saving goal is impossible. Consider being more realistic or maybe steal a bank 😏. \n"""
+            self.result["budget_adjustement"]= IMPOSSIBLE_GOAL_MESSAGE
         else:
             total_needed = target - savings
             monthly_needed = total_needed / timeline
             additional_needed = monthly_needed - savings_rate
             months_needed = (int) (total_needed / savings_rate)
-            now = datetime.now()
-            result_date = now + relativedelta(months=months_needed)
-            formatted_date = result_date.strftime("%Y-%m")  # 'YYYY-MM'
+            current_month = periods.current_month()
+            formatted_date = periods.format_months(periods.add_months(current_month, months_needed))  # 'YYYY-MM'
 
             if sum(non_vital_expenses.values()) > 0 : 
-                reduce_disctretionary = "Consider reducing discretionary expenses to increase your savings rate."
+                reduce_disctretionary = REDUCE_DISCRETIONARY_MESSAGE
             else :
                 reduce_disctretionary = ""
 
-            self.result["budget_adjustement_solution_1"] = [monthly_needed, (datetime.now() + relativedelta(months=timeline)).strftime("%Y-%m")]
+            self.result["budget_adjustement_solution_1"] = [monthly_needed, periods.format_months(periods.add_months(current_month, timeline))]
             self.result["budget_adjustement_solution_2"] = [savings_rate,formatted_date]
             print("First solution  : ", self.result["budget_adjustement_solution_1"])
             print("Second solution  : ", self.result["budget_adjustement_solution_2"])
 
-            self.result["budget_adjustement"]= f"""{reduce_disctretionary} You need to monthly save {monthly_needed:.2f}, but you are only saving {savings_rate:.2f} that means you need to save an additional {additional_needed:.2f} per month.
-            Otherwise, your goal will be reached, approximately, in {formatted_date}."""
+            self.result["budget_adjustement"]= BUDGET_ADJUSTMENT_MESSAGE.format(
+                reduce_disctretionary, monthly_needed, savings_rate, additional_needed, formatted_date
+            )
 
 def verifyExpenseIsMandatory(expense_name):
-    return expense_name in vital_expenses
+    return taxonomy.is_mandatory(expense_name)
 
 def apply_50_30_20_rule(result,income, vital_expenses, non_vital_expenses):
     """Applies the 50-30-20 rule to classify spending."""
@@ -193,25 +251,28 @@ def apply_50_30_20_rule(result,income, vital_expenses, non_vital_expenses):
             del result["follow_recommendations_warning"]
         print("ACTUAL SAVING ", actual_savings)
         print("NOT  SAVING ", savings_limit)
-        follow_recommendations_message = "Your actual distribution is better than the one recommended by the 50/30/20 rule, Good job! \n"
+        follow_recommendations_message = FOLLOW_RECOMMENDATIONS_SUCCESS_MESSAGE
         if (actual_discretionary>discretionary_limit):
-            follow_recommendations_message += "You can save even more if you limit your discretionary expenses."
+            follow_recommendations_message += LIMIT_DISCRETIONARY_MESSAGE
         result["follow_recommendations_success"] = follow_recommendations_message
     else :
         if "follow_recommendations_success" in result.keys():
             del result["follow_recommendations_success"]
-        result["follow_recommendations_warning"] = "We recommend you to follow the 50/30/20 rule to have more savings."
+        result["follow_recommendations_warning"] = FOLLOW_RECOMMENDATIONS_WARNING_MESSAGE
     
     return {
         "recommended": [essentials_limit, discretionary_limit, savings_limit],
         "actual": [actual_essentials, actual_discretionary, actual_savings],
     }
 
+# Pre-built engines shared by every session and thread of the app
+engine_pool = EnginePool(SavingsGoalTracker, max_size=8)
+# The same rules evaluated without the Rete network (main(..., compiled=True))
+compiled_tracker = CompiledRuleSet(SavingsGoalTracker)
+
 def create_financial_data (
         vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline
         ):
-    engine = SavingsGoalTracker()
-
     finance_data = {}
 
     finance_data['vital_expenses'] = vital_expenses_data
@@ -223,34 +284,55 @@ def create_financial_data (
     finance_data['saving_timeline'] = saving_timeline
     finance_data['goal_description']=goal_description
 
-    engine.declare(Finances(**finance_data))
-
     return finance_data
 
 def main(
-        vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline 
+        vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline,
+        compiled=False
     ):
 
 
     finance_data = create_financial_data(
         vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline
     )
-    # Initialize the expert system
-    engine = SavingsGoalTracker()
-    engine.reset()
+    if compiled:
+        return compiled_tracker.run(finance_facts(finance_data))
+
+    # Check out a pre-built expert system (already reset) from the pool
+    with engine_pool.checkout() as engine:
+        return run_engine(engine, finance_data)
+
+
+def finance_facts(finance_data):
+    """The facts declared for finance_data, in declaration order."""
+    vital_expenses_data = finance_data["vital_expenses"]
+    non_vital_expenses_data = finance_data["non_vital_expenses"]
+    goal_description = finance_data["goal_description"]
+    income = finance_data["income"]
+    saving_target = finance_data["saving_target"]
+    saving = finance_data["saving"]
+    saving_timeline = finance_data["saving_timeline"]
 
     # Calculating total expenses
     total_expenses = sum(finance_data["vital_expenses"].values()) + sum(finance_data["non_vital_expenses"].values())
 
+    return [
+        Fact(monthly_income=income),
+        Fact(current_savings=saving),
+        Fact(target_amount=saving_target),
+        Fact(timeline=saving_timeline),
+        Fact(monthly_expenses=total_expenses),
+        Fact(vital_expenses = vital_expenses_data),
+        Fact(non_vital_expenses = non_vital_expenses_data),
+        Fact(goal_description = goal_description),
+    ]
+
+
+def run_engine(engine, finance_data):
+    """Declares the facts of finance_data into a reset engine, runs it and returns its result."""
     # Declare facts for the expert system
-    engine.declare(Fact(monthly_income=income))
-    engine.declare(Fact(current_savings=saving))
-    engine.declare(Fact(target_amount=saving_target))
-    engine.declare(Fact(timeline=saving_timeline))
-    engine.declare(Fact(monthly_expenses=total_expenses))
-    engine.declare(Fact(vital_expenses = vital_expenses_data))
-    engine.declare(Fact(non_vital_expenses = non_vital_expenses_data))
-    engine.declare(Fact(goal_description = goal_description))
+    for fact in finance_facts(finance_data):
+        engine.declare(fact)
 
 
     # Run the expert system
@@ -302,4 +384,6 @@ def main(
 
 
 if __name__ == "__main__":
-    main()
+    # Bulk scoring of a CSV/Parquet file of profiles (see score.py)
+    from score import cli
+    cli()
@@ -0,0 +1,99 @@
+import heapq
+
+import numpy as np
+
+import periods
+
+
+def _on_time_goals(amounts, deadlines, priorities, savings_rate):
+    """Returns the boolean mask of goals funded on time.
+
+    Levels are solved from the highest priority down, each one keeping the goals chosen above it.
+    A set of goals can all be met exactly when funding them in deadline order meets every deadline,
+    so the goals already kept leave room[t] = savings_rate * t - (their amounts due by t) for the
+    level; its suffix minimum is non-decreasing in t, which makes the level a plain "most jobs on
+    time" problem. Moore-Hodgson solves it optimally: walk the level in deadline order and, when
+    the running total exceeds the room at the current deadline, drop the largest goal kept so far.
+    This maximizes the number of deadlines met at each level given the levels above it (the sets
+    kept also have the smallest total amount), in O(levels * n log n).
+    """
+    order = np.argsort(deadlines, kind="stable")
+    sorted_deadlines = deadlines[order]
+    # Last position of each deadline, so goals due the same month count together
+    last_of_deadline = np.searchsorted(sorted_deadlines, sorted_deadlines, side="right") - 1
+    kept = np.zeros(len(amounts), dtype=bool)
+    for level in np.unique(priorities)[::-1]:
+        due = np.cumsum(np.where(kept[order], amounts[order], 0))[last_of_deadline]
+        room = savings_rate * sorted_deadlines - due
+        room = np.minimum.accumulate(room[::-1])[::-1] + 1e-9
+        selected = []
+        total = 0.0
+        for position in np.flatnonzero(priorities[order] == level):
+            heapq.heappush(selected, (-amounts[order[position]], order[position]))
+            total += amounts[order[position]]
+            if total > room[position]:
+                largest, _ = heapq.heappop(selected)
+                total += largest
+        kept[[index for _, index in selected]] = True
+    return kept
+
+
+def allocation_schedule(amounts, funding_order, savings_rate, horizon):
+    """Month by month allocation (goals x months) when goals are funded one after the other in funding_order."""
+    ordered = amounts[funding_order]
+    end = np.cumsum(ordered)
+    start = end - ordered
+    saved_by_month = savings_rate * np.arange(horizon + 1)
+    # Money saved during month m is the slice [saved_by_month[m-1], saved_by_month[m]) of the cumulative savings
+    low = np.maximum(saved_by_month[None, :-1], start[:, None])
+    high = np.minimum(saved_by_month[None, 1:], end[:, None])
+    schedule = np.empty((len(amounts), horizon))
+    schedule[funding_order] = np.maximum(high - low, 0)
+    return schedule
+
+
+def solve_goals(goals, savings_rate, now=None):
+    """Splits a monthly savings rate across several goals to miss as few deadlines as possible.
+
+    Each goal is a dict with "name", "target", "deadline" (months from now), an optional "priority"
+    (higher is more important, default 0) and an optional "saved" amount already put aside.
+    Goals that cannot all be met are funded after the ones that can (by priority, then deadline).
+    """
+    names = [goal["name"] for goal in goals]
+    amounts = np.array([max(goal["target"] - goal.get("saved", 0), 0) for goal in goals], dtype=float)
+    deadlines = np.array([goal["deadline"] for goal in goals], dtype=float)
+    priorities = np.array([goal.get("priority", 0) for goal in goals])
+
+    if savings_rate <= 0:
+        on_time = amounts <= 0
+    else:
+        on_time = _on_time_goals(amounts, deadlines, priorities, savings_rate)
+    missed = ~on_time
+    funding_order = np.concatenate([
+        np.flatnonzero(on_time)[np.argsort(deadlines[on_time], kind="stable")],
+        np.flatnonzero(missed)[np.lexsort((deadlines[missed], -priorities[missed]))],
+    ])
+
+    total = amounts.sum()
+    horizon = int(np.ceil(total / savings_rate)) if savings_rate > 0 and total > 0 else 0
+    schedule = allocation_schedule(amounts, funding_order, savings_rate, horizon)
+    if horizon > 0:
+        funded = np.cumsum(schedule, axis=1) >= amounts[:, None] - 1e-9
+        completion = np.where(amounts <= 0, 0, np.where(funded.any(axis=1), funded.argmax(axis=1) + 1, -1))
+    else:
+        # Nothing left to save, or nothing saved at all
+        completion = np.where(amounts <= 0, 0, -1)
+
+    months = periods.format_months(periods.month_range(periods.current_month(now), horizon))
+    return {
+        "on_time": [names[i] for i in funding_order if on_time[i]],
+        "missed": [names[i] for i in funding_order if missed[i]],
+        "months": months,
+        "schedule": {name: schedule[i].tolist() for i, name in enumerate(names)},
+        "completion_month": {name: int(completion[i]) if completion[i] >= 0 else None for i, name in enumerate(names)},
+    }
+
+
+def solve_goals_batch(users):
+    """Runs solve_goals for many users: `users` maps a username to (goals, savings_rate)."""
+    return {username: solve_goals(goals, savings_rate) for username, (goals, savings_rate) in users.items()}
@@ -0,0 +1,212 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+import expert
+import periods
+from jobs import start_periodic
+from storage import RESULT_DB_PATH, thread_connection
+
+# How often the background thread merges closed months into snapshots (seconds)
+COMPACTION_INTERVAL = 3600
+
+PROGRESS_ACHIEVED_MESSAGE = "Congratulations! You've achieved your monthly milestone."
+PROGRESS_BEHIND_MESSAGE = "You are behind. You need to save at least {:.2f} more this month."
+
+
+def numeric_results(result, income, saving, saving_target, saving_timeline, vital_expenses_data, non_vital_expenses_data):
+    """Extracts the numbers behind an expert system result (the result itself mostly holds sentences)."""
+    total_expenses = sum(vital_expenses_data.values()) + sum(non_vital_expenses_data.values())
+    numbers = {
+        "savings_rate": max(income - total_expenses, 0),
+        "total_expenses": total_expenses,
+        "monthly_milestone": (saving_target - saving) / saving_timeline if saving_timeline else None,
+        "goal_achievable": result.get("feasibility_check") != expert.NOT_FEASIBLE_MESSAGE,
+    }
+    if "rule_50_30_20" in result:
+        numbers["recommended"] = list(result["rule_50_30_20"]["recommended"])
+        numbers["actual"] = list(result["rule_50_30_20"]["actual"])
+    if "budget_adjustement_solution_1" in result:
+        numbers["solution_1"] = list(result["budget_adjustement_solution_1"])
+        numbers["solution_2"] = list(result["budget_adjustement_solution_2"])
+    return numbers
+
+
+class SubmissionHistory:
+    """Append-only log of advisor submissions, compacted into one snapshot per user and month.
+
+    Submissions of the current month stay in `submission_log`; closed months are merged into
+    `monthly_snapshots`, so reading a range only touches the snapshots and log rows of those months.
+    """
+
+    def __init__(self, path=RESULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._compaction_thread = None
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS submission_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT NOT NULL,
+                    month TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    entry TEXT NOT NULL
+                )"""
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS submission_log_user_month ON submission_log (username, month)"
+            )
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS monthly_snapshots (
+                    username TEXT NOT NULL,
+                    month TEXT NOT NULL,
+                    entries TEXT NOT NULL,
+                    last_entry TEXT NOT NULL,
+                    PRIMARY KEY (username, month)
+                )"""
+            )
+
+    def _connection(self):
+        return thread_connection(self._local, self.path)
+
+    def append(self, username, inputs, results, timestamp=None):
+        """Appends one submission (its inputs and numeric results) to the log of username."""
+        timestamp = timestamp or time.time()
+        month = datetime.fromtimestamp(timestamp).strftime("%Y-%m")
+        entry = {"ts": timestamp, "inputs": inputs, "results": results}
+        self._connection().execute(
+            "INSERT INTO submission_log (username, month, ts, entry) VALUES (?, ?, ?, ?)",
+            (username, month, timestamp, json.dumps(entry)),
+        )
+        return entry
+
+    def entries(self, username, start_month=None, end_month=None):
+        """Returns the submissions of username between two 'YYYY-MM' months (inclusive), oldest first."""
+        start_month = start_month or "0000-00"
+        end_month = end_month or "9999-99"
+        connection = self._connection()
+        entries = []
+        for (snapshot,) in connection.execute(
+            "SELECT entries FROM monthly_snapshots WHERE username = ? AND month BETWEEN ? AND ? ORDER BY month",
+            (username, start_month, end_month),
+        ):
+            entries.extend(json.loads(snapshot))
+        for (entry,) in connection.execute(
+            "SELECT entry FROM submission_log WHERE username = ? AND month BETWEEN ? AND ? ORDER BY ts",
+            (username, start_month, end_month),
+        ):
+            entries.append(json.loads(entry))
+        entries.sort(key=lambda entry: entry["ts"])
+        return entries
+
+    def entries_since(self, username, after_ts):
+        """Returns the submissions of username made after the timestamp after_ts, oldest first.
+
+        Only the snapshots and log rows from the month of after_ts on are read.
+        """
+        month = datetime.fromtimestamp(after_ts).strftime("%Y-%m")
+        return [entry for entry in self.entries(username, start_month=month) if entry["ts"] > after_ts]
+
+    def monthly_series(self, username, start_month=None, end_month=None):
+        """Returns {month: last submission of that month} for username, reading only the snapshot summaries."""
+        start_month = start_month or "0000-00"
+        end_month = end_month or "9999-99"
+        connection = self._connection()
+        series = {}
+        for month, last_entry in connection.execute(
+            "SELECT month, last_entry FROM monthly_snapshots WHERE username = ? AND month BETWEEN ? AND ?",
+            (username, start_month, end_month),
+        ):
+            series[month] = json.loads(last_entry)
+        for month, entry in connection.execute(
+            "SELECT month, entry FROM submission_log WHERE username = ? AND month BETWEEN ? AND ? ORDER BY ts",
+            (username, start_month, end_month),
+        ):
+            series[month] = json.loads(entry)
+        return dict(sorted(series.items()))
+
+    def latest(self, username):
+        """Returns the most recent submission of username, or None."""
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT entry FROM submission_log WHERE username = ? ORDER BY ts DESC LIMIT 1", (username,)
+        ).fetchone()
+        if row is None:
+            row = connection.execute(
+                "SELECT last_entry FROM monthly_snapshots WHERE username = ? ORDER BY month DESC LIMIT 1", (username,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def compact(self, before_month=None):
+        """Merges the log rows of every month before before_month (default: the current month) into snapshots."""
+        before_month = before_month or datetime.now().strftime("%Y-%m")
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT username, month, entry FROM submission_log WHERE month < ? ORDER BY username, month, ts",
+                (before_month,),
+            ).fetchall()
+            segments = {}
+            for username, month, entry in rows:
+                segments.setdefault((username, month), []).append(json.loads(entry))
+            for (username, month), new_entries in segments.items():
+                existing = connection.execute(
+                    "SELECT entries FROM monthly_snapshots WHERE username = ? AND month = ?", (username, month)
+                ).fetchone()
+                entries = (json.loads(existing[0]) if existing else []) + new_entries
+                entries.sort(key=lambda entry: entry["ts"])
+                connection.execute(
+                    "INSERT OR REPLACE INTO monthly_snapshots (username, month, entries, last_entry) VALUES (?, ?, ?, ?)",
+                    (username, month, json.dumps(entries), json.dumps(entries[-1])),
+                )
+            connection.execute("DELETE FROM submission_log WHERE month < ?", (before_month,))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return len(segments)
+
+    def start_compaction(self, interval=COMPACTION_INTERVAL):
+        """Starts a daemon thread running compact() every `interval` seconds (once per process)."""
+        if self._compaction_thread is None:
+            self._compaction_thread = start_periodic(self.compact, interval, "history-compaction")
+
+
+def track_progress(previous_entry, saving, goal_description, saving_target, timestamp=None):
+    """Compares the current savings with the milestone of the previous submission of the same goal.
+
+    There is no verdict (None) when the previous submission was for another goal or target, or
+    when no month has passed since it: no milestone has come due yet.
+    """
+    if previous_entry is None or previous_entry["results"].get("monthly_milestone") is None:
+        return None
+    previous_inputs = previous_entry["inputs"]
+    if previous_inputs.get("goal_description") != goal_description or previous_inputs.get("saving_target") != saving_target:
+        return None
+    timestamp = timestamp or time.time()
+    months_elapsed = int(periods.months_between(
+        datetime.fromtimestamp(previous_entry["ts"]), datetime.fromtimestamp(timestamp)
+    ))
+    if months_elapsed <= 0:
+        return None
+    expected_savings = previous_inputs["saving"] + previous_entry["results"]["monthly_milestone"] * months_elapsed
+    if saving >= expected_savings:
+        return PROGRESS_ACHIEVED_MESSAGE
+    return PROGRESS_BEHIND_MESSAGE.format(expected_savings - saving)
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    """Returns the process-wide submission history, with its background compaction running."""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = SubmissionHistory()
+            _history.start_compaction()
+        return _history
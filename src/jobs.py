@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import TTLCache
+
+JOB_WORKERS = int(os.environ.get("FIN_GENIUS_JOB_WORKERS", "4"))
+# Submissions waiting or running at once; beyond that submit() refuses new ones
+MAX_PENDING_JOBS = int(os.environ.get("FIN_GENIUS_MAX_PENDING_JOBS", "64"))
+# Seconds a finished job stays available to the session polling it
+JOB_TTL = 600
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+class JobExecutor:
+    """Bounded thread pool running advisor submissions off the Streamlit script thread.
+
+    submit() returns a job ID at once; the session polls status() until the job is done. The
+    result is published as soon as `task` returns, and `then(result)` (persistence) runs
+    afterwards in the same worker, so nobody waits for the disk writes. At most `max_pending`
+    jobs are queued or running: beyond that submit() returns None instead of queueing
+    indefinitely behind slow runs.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=MAX_PENDING_JOBS, ttl=JOB_TTL):
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="advisor-job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._jobs = TTLCache(maxsize=max(4 * max_pending, 1024), ttl=ttl)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+
+    def submit(self, task, *args, then=None):
+        """Runs task(*args) in the background and returns its job ID, or None when the executor is full."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return None
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {"status": PENDING, "result": None, "error": None, "submitted": time.time()}
+            self.submitted += 1
+        try:
+            self._executor.submit(self._run, job_id, task, args, then)
+        except RuntimeError:
+            # The executor is shutting down
+            self._slots.release()
+            with self._lock:
+                del self._jobs[job_id]
+            return None
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._jobs[job_id] = {**job, **fields}
+
+    def _run(self, job_id, task, args, then):
+        try:
+            self._update(job_id, status=RUNNING)
+            try:
+                result = task(*args)
+            except Exception as e:
+                self._update(job_id, status=FAILED, error=str(e), finished=time.time())
+                return
+            self._update(job_id, status=DONE, result=result, finished=time.time())
+            if then is not None:
+                try:
+                    then(result)
+                except Exception as e:
+                    print(f"Background job {job_id} failed after its result: {e}")
+        finally:
+            self._slots.release()
+
+    def status(self, job_id):
+        """Returns (status, result, error) of a job; status is None for unknown or expired jobs."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None, None, None
+        return job["status"], job["result"], job["error"]
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        """Stops accepting jobs; with wait, returns once the queued jobs (and their persistence) are done."""
+        self._executor.shutdown(wait=wait)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "pending": statuses.count(PENDING),
+            "running": statuses.count(RUNNING),
+            "done": statuses.count(DONE),
+            "failed": statuses.count(FAILED),
+        }
+
+
+def start_periodic(function, interval, name):
+    """Starts a daemon thread (named name) calling function() every `interval` seconds; failures are printed."""
+
+    def run():
+        while True:
+            try:
+                function()
+            except Exception as e:
+                print(f"{name} failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Returns the process-wide job executor, shared by every session."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = JobExecutor()
+        return _executor
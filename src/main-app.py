@@ -1,14 +1,18 @@
 import streamlit as st
 from streamlit import session_state as ss
 import streamlit_authenticator as stauth
-import yaml
-from yaml.loader import SafeLoader
 import time
+from credential_store import get_credential_store
+from metrics import metrics
 
 CONFIG_FILENAME = 'config.yaml'
 
-with open(CONFIG_FILENAME) as file:
-    config = yaml.load(file, Loader=SafeLoader)
+# Parsed once per process; reruns reuse the in-memory copy
+credential_store = get_credential_store(CONFIG_FILENAME)
+config = credential_store.config
+
+# Metrics text file / endpoint, when enabled by FIN_GENIUS_METRICS (started once per process)
+metrics.start_exporters()
 
 authenticator = stauth.Authenticate(
     config['credentials'],
@@ -29,7 +33,9 @@ if ss["authentication_status"] is None or not ss["authentication_status"]:
     login_tab, register_tab = st.tabs(['Login', 'Register'])
 
     with login_tab:
-        authenticator.login(location='main')
+        # The authenticator updates the shared config (login attempts): under the store's lock
+        with credential_store.editing():
+            authenticator.login(location='main')
 
         # if ss["authentication_status"]:
         #     authenticator.logout(location='main')    
@@ -62,7 +68,8 @@ if ss["authentication_status"] is None or not ss["authentication_status"]:
     with register_tab:
         if not ss["authentication_status"]:
             try:
-                email_of_registered_user, username_of_registered_user, name_of_registered_user = authenticator.register_user()
+                with credential_store.editing():
+                    email_of_registered_user, username_of_registered_user, name_of_registered_user = authenticator.register_user()
                 if email_of_registered_user:
                     st.markdown("""
                     <style>
@@ -82,9 +89,8 @@ if ss["authentication_status"] is None or not ss["authentication_status"]:
             except Exception as e:
                 st.error(e)
 
-    # We call below code in case of registration, reset password, etc.
-    with open(CONFIG_FILENAME, 'w') as file:
-        yaml.dump(config, file, default_flow_style=False)
+    # Written only in case of registration, reset password, etc.
+    credential_store.save_if_changed()
 
 elif ss["authentication_status"] is True:
 
@@ -119,7 +125,8 @@ elif ss["authentication_status"] is True:
     st.sidebar.write("") 
     st.sidebar.markdown("---")  # Separator line
     
-    authenticator.logout(button_name="🔓 Logout", location="sidebar", key="1")
+    with credential_store.editing():
+        authenticator.logout(button_name="🔓 Logout", location="sidebar", key="1")
     
     # st.logo("./assets/codingisfun_logo.png")
     st.sidebar.text("Made with ❤️ by FinGenius Team")
@@ -0,0 +1,168 @@
+import atexit
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Instrumentation is off unless FIN_GENIUS_METRICS=1; the metrics are then exported to the
+# Prometheus text file FIN_GENIUS_METRICS_FILE and/or served on http://<host>:FIN_GENIUS_METRICS_PORT/metrics
+METRICS_ENABLED = os.environ.get("FIN_GENIUS_METRICS", "0") == "1"
+METRICS_FILE = os.environ.get("FIN_GENIUS_METRICS_FILE")
+METRICS_PORT = os.environ.get("FIN_GENIUS_METRICS_PORT")
+# How often the text file is rewritten (seconds)
+EXPORT_INTERVAL = 15
+
+METRIC_HELP = {
+    "fin_genius_rule_fires_total": ("counter", "Number of times each expert rule fired."),
+    "fin_genius_rule_seconds": ("summary", "Time spent in each expert rule."),
+    "fin_genius_engine_match_seconds": ("summary", "Time spent matching facts and updating the agenda."),
+    "fin_genius_engine_run_seconds": ("summary", "Duration of a whole expert system run."),
+    "fin_genius_engine_agenda_size": ("summary", "Largest agenda size of each expert system run."),
+    "fin_genius_engine_facts": ("summary", "Facts in working memory at the end of each expert system run."),
+    "fin_genius_save_user_data_seconds": ("summary", "Time spent writing a batch of user records to the store."),
+    "fin_genius_charts_load_seconds": ("summary", "Time spent loading the chart data of a user."),
+}
+
+
+class MetricsRegistry:
+    """Counters and summaries (count and sum) exported in the Prometheus text format.
+
+    When the registry is disabled every method returns immediately and time() hands out a shared
+    no-op context manager, so instrumented code costs an attribute lookup and a call.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+        self._exporter_started = False
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            count, total = self._summaries.get(key, (0, 0.0))
+            self._summaries[key] = (count + 1, total + value)
+
+    def time(self, name, **labels):
+        """Context manager observing the duration of its block into the summary `name`."""
+        if not self.enabled:
+            return _NOOP_TIMER
+        return self._timer(name, labels)
+
+    @contextmanager
+    def _timer(self, name, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = dict(self._summaries)
+        samples = {}
+        for (name, labels), value in counters.items():
+            samples.setdefault(name, []).append((name, labels, value))
+        for (name, labels), (count, total) in summaries.items():
+            samples.setdefault(name, []).extend([(name + "_count", labels, count), (name + "_sum", labels, total)])
+        lines = []
+        for name in sorted(samples):
+            metric_type, description = METRIC_HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample, labels, value in sorted(samples[name], key=lambda sample: (sample[1], sample[0])):
+                label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+                lines.append(f"{sample}{{{label_text}}} {value}" if label_text else f"{sample} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically replaces path with the current metrics (for node_exporter's textfile collector)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w") as outfile:
+                outfile.write(self.render())
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serves the metrics on http://host:port/metrics from a daemon thread. Returns the server."""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+    def start_exporters(self, path=METRICS_FILE, port=METRICS_PORT, interval=EXPORT_INTERVAL):
+        """Starts the text file writer and/or the HTTP endpoint configured by the environment (once per process)."""
+        with self._lock:
+            if not self.enabled or self._exporter_started:
+                return
+            self._exporter_started = True
+        if port:
+            self.serve(int(port))
+        if path:
+            def run():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.write_textfile(path)
+                    except OSError as e:
+                        print(f"Writing metrics to {path} failed: {e}")
+
+            threading.Thread(target=run, name="metrics-textfile", daemon=True).start()
+            atexit.register(self.write_textfile, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+# Process-wide registry used by the expert system and the views
+metrics = MetricsRegistry()
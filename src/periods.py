@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import numpy as np
+
+# Calendar months as numpy.datetime64[M]: month math on whole arrays without per-month Python loops
+
+
+def to_month(value):
+    """Converts a date, datetime, 'YYYY-MM[-DD]' string, datetime64 or an array of those to datetime64[M]."""
+    if hasattr(value, "to_numpy"):
+        value = value.to_numpy()
+    if isinstance(value, (np.ndarray, list, tuple)):
+        return np.asarray(value).astype("datetime64[M]")
+    return np.datetime64(value, "M")
+
+
+def current_month(now=None):
+    return to_month(now or datetime.now())
+
+
+def add_months(month, months):
+    """Shifts month(s) by an int or an int array of months."""
+    return to_month(month) + np.asarray(months).astype(np.int64)
+
+
+def months_between(start, end):
+    """Number of calendar months from start to end (negative if end is before start)."""
+    return (to_month(end) - to_month(start)).astype(np.int64)
+
+
+def month_range(start, count, first=1):
+    """The `count` consecutive months starting `first` months after start."""
+    return to_month(start) + np.arange(first, first + count)
+
+
+def format_months(months):
+    """'YYYY-MM' string(s) of datetime64[M] value(s)."""
+    formatted = np.datetime_as_string(to_month(months), unit="M")
+    return formatted.tolist() if isinstance(formatted, np.ndarray) else str(formatted)
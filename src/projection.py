@@ -0,0 +1,148 @@
+"""Month by month projection of a savings goal with returns on savings and inflation of the target.
+
+SavingsGoalTracker works in today's money with nothing earned on savings: target / timeline. Here
+the savings and each monthly contribution (paid at the end of the month) earn a monthly return
+r, and the target grows with monthly inflation i:
+
+    balance(n) = saving * (1 + r)**n + contribution * ((1 + r)**n - 1) / r
+    target(n)  = saving_target * (1 + i)**n
+
+so the contribution needed for a deadline is a closed form, and the completion month is the first
+month where balance(n) >= target(n), found on a (users x months) grid built with powers of the
+growth factors. Every function takes scalars or arrays of users (broadcast together); batches are
+processed CHUNK_SIZE users at a time to bound memory on 30-year horizons.
+"""
+import numpy as np
+
+import periods
+
+# Assumed annual rates when none are given
+ANNUAL_RETURN = 0.03
+ANNUAL_INFLATION = 0.02
+# 30 years
+HORIZON_MONTHS = 360
+# Users per (users x months) grid: about CHUNK_SIZE * HORIZON_MONTHS * 8 bytes per array
+CHUNK_SIZE = 4096
+
+
+def monthly_rate(annual_rate):
+    """The monthly rate compounding to annual_rate over 12 months."""
+    return np.power(1 + np.asarray(annual_rate, dtype=float), 1 / 12) - 1
+
+
+def _annuity_factor(growth, months, rate):
+    """Sum of growth**k for k < months, i.e. ((1 + r)**n - 1) / r, and n where r == 0."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(rate == 0, months, (growth - 1) / np.where(rate == 0, 1, rate))
+
+
+def project_balance(saving, contribution, months, annual_return=ANNUAL_RETURN):
+    """Savings after `months` months of contributions, with returns compounded monthly."""
+    rate = monthly_rate(annual_return)
+    months = np.asarray(months, dtype=float)
+    growth = np.power(1 + rate, months)
+    return np.asarray(saving, dtype=float) * growth + np.asarray(contribution, dtype=float) * _annuity_factor(growth, months, rate)
+
+
+def inflated_target(saving_target, months, annual_inflation=ANNUAL_INFLATION):
+    """The target expressed in the money of `months` months from now."""
+    return np.asarray(saving_target, dtype=float) * np.power(1 + monthly_rate(annual_inflation), np.asarray(months, dtype=float))
+
+
+def required_contribution(saving_target, saving, saving_timeline, annual_return=ANNUAL_RETURN, annual_inflation=ANNUAL_INFLATION):
+    """Monthly contribution reaching the inflated target after saving_timeline months (0 when the savings suffice).
+
+    With both rates at 0 this is (saving_target - saving) / saving_timeline, the monthly milestone of the advisor.
+    """
+    rate = monthly_rate(annual_return)
+    months = np.asarray(saving_timeline, dtype=float)
+    growth = np.power(1 + rate, months)
+    missing = inflated_target(saving_target, months, annual_inflation) - np.asarray(saving, dtype=float) * growth
+    return np.maximum(missing / _annuity_factor(growth, months, rate), 0)
+
+
+def completion_month(
+        saving_target, saving, contribution, annual_return=ANNUAL_RETURN, annual_inflation=ANNUAL_INFLATION,
+        horizon=HORIZON_MONTHS
+    ):
+    """First month (0 = already reached) where the savings cover the inflated target, -1 if not within horizon."""
+    saving_target, saving, contribution, annual_return, annual_inflation = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=float)) for value in
+          (saving_target, saving, contribution, annual_return, annual_inflation))
+    )
+    months = np.arange(horizon + 1, dtype=float)
+    # Usually every user has the same rates: the growth factors are then one row shared by all
+    uniform = np.all(annual_return == annual_return[0]) and np.all(annual_inflation == annual_inflation[0])
+    completion = np.empty(len(saving_target), dtype=np.int64)
+    for start in range(0, len(saving_target), CHUNK_SIZE):
+        users = slice(start, start + CHUNK_SIZE)
+        rates = (annual_return[:1], annual_inflation[:1]) if uniform else (annual_return[users], annual_inflation[users])
+        rate = monthly_rate(rates[0])[:, None]
+        growth = np.power(1 + rate, months[None, :])
+        balance = saving[users, None] * growth + contribution[users, None] * _annuity_factor(growth, months[None, :], rate)
+        reached = balance >= inflated_target(saving_target[users, None], months[None, :], rates[1][:, None])
+        completion[users] = np.where(reached.any(axis=1), reached.argmax(axis=1), -1)
+    return completion
+
+
+def project_goal(
+        saving_target, saving, saving_timeline, savings_rate, annual_return=ANNUAL_RETURN, annual_inflation=ANNUAL_INFLATION,
+        horizon=HORIZON_MONTHS, now=None
+    ):
+    """Projection of one user's goal: required contribution, completion date and the month by month path.
+
+    savings_rate is what the user saves each month (the contribution), as computed by calculate_savings_rate.
+    """
+    required = float(required_contribution(saving_target, saving, saving_timeline, annual_return, annual_inflation))
+    month = int(completion_month(saving_target, saving, savings_rate, annual_return, annual_inflation, horizon)[0])
+    length = max(int(saving_timeline), month if month >= 0 else horizon)
+    months = np.arange(1, length + 1)
+    current_month = periods.current_month(now)
+    return {
+        "required_contribution": required,
+        "linear_contribution": max((saving_target - saving) / saving_timeline, 0),
+        "completion_month": month if month >= 0 else None,
+        "completion_date": periods.format_months(periods.add_months(current_month, month)) if month >= 0 else None,
+        "goal_achievable": savings_rate >= required,
+        "months": periods.format_months(periods.month_range(current_month, length)),
+        "balance": project_balance(saving, savings_rate, months, annual_return).tolist(),
+        "target": inflated_target(saving_target, months, annual_inflation).tolist(),
+    }
+
+
+def project_arrays(
+        income, saving, saving_target, saving_timeline, vital_expenses_data, non_vital_expenses_data,
+        annual_return=ANNUAL_RETURN, annual_inflation=ANNUAL_INFLATION, horizon=HORIZON_MONTHS
+    ):
+    """Projects whole arrays of profiles (the arguments of batch.evaluate_arrays). Returns a dict of numpy arrays."""
+    income = np.asarray(income, dtype=float)
+    # NaN: category not selected
+    total_expenses = np.zeros_like(income)
+    for column in [*vital_expenses_data.values(), *non_vital_expenses_data.values()]:
+        total_expenses = total_expenses + np.nan_to_num(np.asarray(column, dtype=float))
+    savings_rate = np.maximum(income - total_expenses, 0)
+    required = required_contribution(saving_target, saving, saving_timeline, annual_return, annual_inflation)
+    return {
+        "savings_rate": savings_rate,
+        "required_contribution": required,
+        "goal_achievable": savings_rate >= required,
+        "completion_month": completion_month(saving_target, saving, savings_rate, annual_return, annual_inflation, horizon),
+    }
+
+
+def project_frame(frame, annual_return=ANNUAL_RETURN, annual_inflation=ANNUAL_INFLATION, horizon=HORIZON_MONTHS):
+    """project_arrays over a profile DataFrame laid out as for batch.evaluate_frame."""
+    import batch
+
+    vital_columns, non_vital_columns = batch.split_expense_columns(frame.columns)
+    return project_arrays(
+        frame[batch.INCOME_COLUMN].to_numpy(),
+        frame[batch.SAVING_COLUMN].to_numpy(),
+        frame[batch.TARGET_COLUMN].to_numpy(),
+        frame[batch.TIMELINE_COLUMN].to_numpy(),
+        {column: frame[column].to_numpy() for column in vital_columns},
+        {column: frame[column].to_numpy() for column in non_vital_columns},
+        annual_return,
+        annual_inflation,
+        horizon,
+    )
@@ -0,0 +1,111 @@
+import copy
+import hashlib
+import json
+import threading
+from datetime import datetime
+
+from cachetools import TTLCache
+
+import expert
+
+
+class _CountingTTLCache(TTLCache):
+    """TTLCache that counts LRU evictions and TTL expirations."""
+
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize, ttl)
+        self.evictions = 0
+        self.expirations = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.expirations += len(expired)
+        return expired
+
+
+def _normalize_expenses(expenses):
+    return sorted((str(name), value) for name, value in (expenses or {}).items())
+
+
+def fingerprint(vital_expenses_data, non_vital_expenses_data, income, saving_target, saving, saving_timeline, month=None):
+    """Canonical hash of the inputs that drive expert.main.
+
+    The current month is part of the key because suggest_budget_adjustments dates its
+    solutions from datetime.now(). The goal description is not: it is copied into the result as is.
+    """
+    payload = {
+        "vital_expenses": _normalize_expenses(vital_expenses_data),
+        "non_vital_expenses": _normalize_expenses(non_vital_expenses_data),
+        "income": income,
+        "saving_target": saving_target,
+        "saving": saving,
+        "saving_timeline": saving_timeline,
+        "month": month or datetime.now().strftime("%Y-%m"),
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """LRU + TTL bounded cache of expert system results, safe to share between sessions."""
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self._cache = _CountingTTLCache(maxsize, ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            result = self._cache.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return copy.deepcopy(result)
+
+    def put(self, key, result):
+        with self._lock:
+            self._cache[key] = copy.deepcopy(result)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self._cache.evictions,
+                "expirations": self._cache.expirations,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+            }
+
+
+# Process-wide cache in front of expert.main
+advisor_cache = ResultCache()
+
+
+def cached_main(
+        vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline,
+        compiled=False
+    ):
+    """Same as expert.main, but identical submissions within the TTL skip the rule engine."""
+    key = fingerprint(vital_expenses_data, non_vital_expenses_data, income, saving_target, saving, saving_timeline)
+    result = advisor_cache.get(key)
+    if result is None:
+        result = expert.main(
+            vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline,
+            compiled=compiled
+        )
+        advisor_cache.put(key, result)
+    result["goal_description"] = goal_description
+    return result
@@ -0,0 +1,83 @@
+import numpy as np
+
+import periods
+
+# Default sweep: deadlines of 1 to 120 months and 200 monthly contribution levels
+DEADLINE_MONTHS = 120
+CONTRIBUTION_LEVELS = 200
+
+# Values of the status grid, one per feasibility_check verdict
+NOT_FEASIBLE, FEASIBLE_WITH_SAVINGS, FEASIBLE_WITHOUT_SAVINGS = 0, 1, 2
+STATUS_LABELS = {
+    NOT_FEASIBLE: "Not achievable",
+    FEASIBLE_WITH_SAVINGS: "Achievable with current savings",
+    FEASIBLE_WITHOUT_SAVINGS: "Achievable",
+}
+
+
+def default_contributions(saving_target, saving, savings_rate, levels=CONTRIBUTION_LEVELS):
+    """Monthly contribution levels from 0 to twice the current savings rate (at least what funds the goal in a year)."""
+    upper = max(2 * savings_rate, saving_target / 12, max(saving_target - saving, 0) / 12, 1.0)
+    return np.linspace(0, upper, levels)
+
+
+def feasibility_surface(saving_target, saving, deadlines=None, contributions=None, savings_rate=0):
+    """Evaluates feasibility_check and generate_milestones over a grid of deadlines x monthly contributions.
+
+    The monthly contribution stands for the savings rate of SavingsGoalTracker, so every cell is
+    the verdict the advisor would give for that deadline (in months) if that much were saved
+    each month. Returns the 1-D axes and grids of shape (len(deadlines), len(contributions)):
+    status (NOT_FEASIBLE, FEASIBLE_WITH_SAVINGS or FEASIBLE_WITHOUT_SAVINGS), shortfall (monthly
+    amount missing to reach the milestone, negative when ahead) and savings_exceeds_milestone.
+    """
+    deadlines = np.arange(1, DEADLINE_MONTHS + 1) if deadlines is None else np.asarray(deadlines)
+    if np.any(deadlines <= 0):
+        raise ValueError("deadlines must be positive numbers of months")
+    if contributions is None:
+        contributions = default_contributions(saving_target, saving, savings_rate)
+    contributions = np.asarray(contributions, dtype=float)
+
+    # feasibility_check, broadcast over (deadline, contribution)
+    required_rate = saving_target / deadlines
+    monthly_milestone = (saving_target - saving) / deadlines
+    without_saving = contributions[None, :] >= required_rate[:, None]
+    # The "with savings" verdict does not depend on the contribution
+    with_saving = ~without_saving & (saving >= monthly_milestone)[:, None]
+    status = np.where(without_saving, FEASIBLE_WITHOUT_SAVINGS, np.where(with_saving, FEASIBLE_WITH_SAVINGS, NOT_FEASIBLE))
+
+    # generate_milestones(_without_savings)
+    shortfall = monthly_milestone[:, None] - contributions[None, :]
+    savings_exceeds_milestone = without_saving & (shortfall < 0)
+
+    # Earliest feasible deadline of every contribution level (0 if none within the grid)
+    feasible = status != NOT_FEASIBLE
+    earliest = np.where(feasible.any(axis=0), deadlines[feasible.argmax(axis=0)], 0)
+    return {
+        "deadlines": deadlines,
+        "contributions": contributions,
+        "required_rate": required_rate,
+        "monthly_milestone": monthly_milestone,
+        "status": status.astype(np.int8),
+        "shortfall": shortfall,
+        "savings_exceeds_milestone": savings_exceeds_milestone,
+        "earliest_deadline": earliest,
+    }
+
+
+def surface_from_entry(entry, deadline_months=DEADLINE_MONTHS, levels=CONTRIBUTION_LEVELS, now=None):
+    """The feasibility surface around the inputs of one submission (a history entry), with 'YYYY-MM' deadline labels."""
+    inputs = entry["inputs"]
+    savings_rate = entry["results"]["savings_rate"]
+    timeline = max(int(inputs["saving_timeline"]), 1)
+    deadline_months = max(deadline_months, timeline)
+    surface = feasibility_surface(
+        inputs["saving_target"],
+        inputs["saving"],
+        np.arange(1, deadline_months + 1),
+        default_contributions(inputs["saving_target"], inputs["saving"], savings_rate, levels),
+    )
+    surface["deadline_labels"] = periods.format_months(
+        periods.add_months(periods.current_month(now), surface["deadlines"])
+    )
+    surface["current"] = (savings_rate, timeline)
+    return surface
@@ -0,0 +1,158 @@
+"""Bulk scoring of savings-goal profiles from the command line.
+
+    python src/score.py profiles.csv scores.parquet --chunk-size 50000 --workers 4
+
+The input (CSV or Parquet) has one profile per row with the columns read by batch.evaluate_frame:
+income, saving, saving_target, saving_timeline, an optional goal_description and one column per
+expense category. It is read in chunks, scored across a process pool with a bounded number of
+chunks in flight, and appended to the output Parquet file chunk by chunk, so memory stays flat.
+Rows that cannot be scored (a saving_timeline of 0, a missing amount) are written with the reason
+in the error column and the other fields empty, and counted in the report.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import batch
+
+# Invalid rows listed in the report per chunk (all of them are counted)
+MAX_REPORTED_ERRORS = 10
+
+RESULT_MESSAGE_FIELDS = [
+    "goal_description",
+    "savings_rate",
+    "feasibility_check",
+    "milestone",
+    "savings_exceeds_milestone",
+    "budget_adjustement",
+    "follow_recommendations_success",
+    "follow_recommendations_warning",
+]
+
+OUTPUT_SCHEMA = pa.schema(
+    [("row", pa.int64()), ("id", pa.string()), ("error", pa.string())]
+    + [(field, pa.string()) for field in RESULT_MESSAGE_FIELDS]
+    + [
+        ("solution_1_monthly", pa.float64()),
+        ("solution_1_date", pa.string()),
+        ("solution_2_monthly", pa.float64()),
+        ("solution_2_date", pa.string()),
+        ("recommended_essentials", pa.float64()),
+        ("recommended_discretionary", pa.float64()),
+        ("recommended_savings", pa.float64()),
+        ("actual_essentials", pa.float64()),
+        ("actual_discretionary", pa.float64()),
+        ("actual_savings", pa.float64()),
+    ]
+)
+
+
+def read_chunks(path, chunk_size):
+    """Yields DataFrames of at most chunk_size rows from a CSV or Parquet file."""
+    if path.endswith(".parquet"):
+        for record_batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield record_batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def flatten_result(result):
+    row = {field: result.get(field) for field in RESULT_MESSAGE_FIELDS}
+    if not isinstance(row["goal_description"], str):
+        row["goal_description"] = None
+    solution_1 = result.get("budget_adjustement_solution_1") or [None, None]
+    solution_2 = result.get("budget_adjustement_solution_2") or [None, None]
+    row["solution_1_monthly"], row["solution_1_date"] = solution_1
+    row["solution_2_monthly"], row["solution_2_date"] = solution_2
+    recommended = result["rule_50_30_20"]["recommended"]
+    actual = result["rule_50_30_20"]["actual"]
+    for i, name in enumerate(["essentials", "discretionary", "savings"]):
+        row[f"recommended_{name}"] = recommended[i]
+        row[f"actual_{name}"] = actual[i]
+    return row
+
+
+def score_chunk(args):
+    """Scores one chunk and returns it as an Arrow table (runs in a worker process)."""
+    frame, first_row, id_column = args
+    profiles = frame.drop(columns=[id_column]) if id_column else frame
+    errors = batch.invalid_profiles(profiles)
+    valid = errors.isna().to_numpy()
+    results = iter(batch.evaluate_frame(profiles[valid]) if valid.any() else [])
+    ids = frame[id_column].astype(str).tolist() if id_column else [None] * len(frame)
+    rows = [flatten_result(next(results)) if ok else {"error": error} for ok, error in zip(valid, errors)]
+    for offset, row in enumerate(rows):
+        row["row"] = first_row + offset
+        row["id"] = ids[offset]
+    return pa.Table.from_pylist(rows, schema=OUTPUT_SCHEMA)
+
+
+def score_file(input_path, output_path, chunk_size=50000, workers=None, id_column=None, report=sys.stderr):
+    """Streams input_path through the batch evaluator into output_path. Returns (rows, seconds).
+
+    Rows that cannot be scored are written with their error and reported, without stopping the run.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    rows = 0
+    invalid = 0
+
+    def tasks():
+        first_row = 0
+        for frame in read_chunks(input_path, chunk_size):
+            yield frame, first_row, id_column
+            first_row += len(frame)
+
+    def write(table):
+        nonlocal rows, invalid
+        writer.write_table(table)
+        rows += table.num_rows
+        errors = table.filter(pc.is_valid(table["error"]))
+        invalid += errors.num_rows
+        for row, error in zip(errors["row"].to_pylist()[:MAX_REPORTED_ERRORS], errors["error"].to_pylist()):
+            print(f"Row {row} not scored: {error}", file=report)
+        elapsed = time.perf_counter() - start
+        print(f"{rows} rows scored, {rows / elapsed:,.0f} rows/s", file=report)
+
+    with pq.ParquetWriter(output_path, OUTPUT_SCHEMA) as writer:
+        if workers == 1:
+            for task in tasks():
+                write(score_chunk(task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # At most 2 chunks per worker are read ahead, whatever the size of the input
+                pending = []
+                for task in tasks():
+                    pending.append(executor.submit(score_chunk, task))
+                    if len(pending) >= 2 * workers:
+                        write(pending.pop(0).result())
+                for future in pending:
+                    write(future.result())
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {rows} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s)", file=report)
+    if invalid:
+        print(f"{invalid} rows could not be scored (see the error column)", file=report)
+    return rows, elapsed
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Score savings-goal profiles with the Fin Genius expert rules.")
+    parser.add_argument("input", help="CSV or Parquet file of profiles")
+    parser.add_argument("output", help="Parquet file to write")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows per chunk (default: 50000)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--id-column", default=None, help="input column copied to the output as id")
+    args = parser.parse_args(argv)
+    score_file(args.input, args.output, args.chunk_size, args.workers, args.id_column)
+
+
+if __name__ == "__main__":
+    cli()
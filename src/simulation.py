@@ -0,0 +1,85 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import periods
+
+# Default monthly volatility (standard deviation relative to the amount)
+INCOME_VOLATILITY = 0.05
+EXPENSE_VOLATILITY = 0.10
+# Paths simulated together; bounds memory to about CHUNK_SIZE * horizon * 8 bytes per array
+CHUNK_SIZE = 20000
+PERCENTILES = (10, 50, 90)
+
+
+def _simulate_chunk(args):
+    """Simulates n paths and returns the month (1-based) each one reaches the amount needed (0 if never)."""
+    seed, n, horizon, income, income_sd, expenses, expenses_sd, needed = args
+    rng = np.random.default_rng(seed)
+    incomes = np.maximum(income + income_sd * rng.standard_normal((n, horizon)), 0)
+    monthly_expenses = np.maximum(expenses + expenses_sd * rng.standard_normal((n, horizon)), 0)
+    # Unlike calculate_savings_rate, a month with a deficit draws on the savings accumulated so far
+    cumulative = np.cumsum(incomes - monthly_expenses, axis=1)
+    reached = cumulative >= needed
+    return np.where(reached.any(axis=1), reached.argmax(axis=1) + 1, 0)
+
+
+def simulate_goal(
+        vital_expenses_data, non_vital_expenses_data, income, saving_target, saving, saving_timeline,
+        n_paths=10000, horizon=None, income_volatility=INCOME_VOLATILITY, expense_volatility=EXPENSE_VOLATILITY,
+        seed=None, workers=None, now=None
+    ):
+    """Monte Carlo version of feasibility_check: draws monthly income and expense paths around the given amounts.
+
+    expense_volatility is either one value for every category or a dict {category: volatility}.
+    Categories are drawn independently, so their noise is summed into one normal draw per month.
+    Returns the probability of reaching saving_target by saving_timeline and percentile completion dates.
+    """
+    horizon = horizon or max(saving_timeline, 60)
+    expenses = {**vital_expenses_data, **non_vital_expenses_data}
+    if not isinstance(expense_volatility, dict):
+        expense_volatility = {category: expense_volatility for category in expenses}
+    total_expenses = float(sum(expenses.values()))
+    expenses_sd = float(np.sqrt(sum(
+        (amount * expense_volatility.get(category, EXPENSE_VOLATILITY)) ** 2 for category, amount in expenses.items()
+    )))
+    needed = saving_target - saving
+
+    if needed <= 0:
+        completion = np.zeros(n_paths, dtype=np.int64)
+    else:
+        chunk_sizes = [min(CHUNK_SIZE, n_paths - start) for start in range(0, n_paths, CHUNK_SIZE)]
+        seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+        tasks = [
+            (chunk_seed, size, horizon, income, income * income_volatility, total_expenses, expenses_sd, needed)
+            for chunk_seed, size in zip(seeds, chunk_sizes)
+        ]
+        if workers and workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = list(executor.map(_simulate_chunk, tasks))
+        else:
+            chunks = [_simulate_chunk(task) for task in tasks]
+        completion = np.concatenate(chunks)
+
+    reached = completion > 0 if needed > 0 else np.ones(n_paths, dtype=bool)
+    completion_months = np.where(reached, completion, np.inf)
+    current_month = periods.current_month(now)
+    percentile_months = {}
+    percentile_dates = {}
+    for percentile, month in zip(PERCENTILES, np.percentile(completion_months, PERCENTILES, method="higher")):
+        if np.isfinite(month):
+            month = int(month)
+            percentile_months[percentile] = month
+            percentile_dates[percentile] = periods.format_months(periods.add_months(current_month, month))
+        else:
+            # Less than `percentile`% of the paths reach the goal within the horizon
+            percentile_months[percentile] = None
+            percentile_dates[percentile] = None
+    return {
+        "probability": float(np.mean(completion_months <= saving_timeline)),
+        "probability_within_horizon": float(np.mean(reached)),
+        "percentile_months": percentile_months,
+        "percentile_dates": percentile_dates,
+        "n_paths": n_paths,
+        "horizon": horizon,
+    }
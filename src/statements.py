@@ -0,0 +1,307 @@
+"""Bank statement ingestion: monthly expense totals per category, ready for expert.main.
+
+    python src/statements.py statement.csv --months 3
+
+CSV exports are streamed with pyarrow's incremental reader and OFX files are scanned through a
+memory map, so memory stays flat whatever the length of the statement. Each transaction label is
+classified with the category taxonomy (each distinct label once) and the amounts are summed per
+calendar month and category as the chunks go by.
+"""
+import argparse
+import csv
+import mmap
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+import periods
+
+DATE_COLUMNS = ["date", "transaction date", "booking date", "posting date", "value date", "posted"]
+AMOUNT_COLUMNS = ["amount", "transaction amount", "montant", "value"]
+DEBIT_COLUMNS = ["debit", "withdrawal", "paid out", "debit amount"]
+CREDIT_COLUMNS = ["credit", "deposit", "paid in", "credit amount"]
+LABEL_COLUMNS = ["description", "label", "merchant", "payee", "name", "memo", "details", "libelle", "narrative"]
+
+# Bytes of CSV parsed per chunk
+CSV_BLOCK_SIZE = 4 << 20
+# Bytes read from the start of a CSV to detect its decimal separator
+DECIMAL_SAMPLE_SIZE = 64 << 10
+OFX_CHUNK_ROWS = 50000
+UNCLASSIFIED = "unclassified"
+
+_OFX_TRANSACTION = re.compile(rb"<STMTTRN>(.*?)</STMTTRN>", re.S | re.I)
+_OFX_FIELD = re.compile(rb"<(DTPOSTED|TRNAMT|NAME|MEMO)>([^<\r\n]*)", re.I)
+# The last separator of an amount and the digits after it: '1.234,50' -> (',', '50')
+_LAST_SEPARATOR = re.compile(r"([.,])([0-9]+)[^0-9.,]*$")
+
+
+def _find_column(columns, candidates):
+    lowered = {column.strip().lower(): column for column in columns}
+    return next((lowered[name] for name in candidates if name in lowered), None)
+
+
+def _read_header(source):
+    """Returns (header line, delimiter) of a CSV path or binary file object, leaving the file at its start."""
+    if hasattr(source, "read"):
+        first_line = source.readline()
+        source.seek(0)
+    else:
+        with open(source, "rb") as infile:
+            first_line = infile.readline()
+    first_line = first_line.decode("utf-8-sig")
+    delimiter = max([",", ";", "\t", "|"], key=first_line.count)
+    return next(csv.reader([first_line], delimiter=delimiter)), delimiter
+
+
+def _read_sample(source, delimiter, size=DECIMAL_SAMPLE_SIZE):
+    """Returns the first rows of a CSV path or binary file object as dicts, leaving the file at its start."""
+    if hasattr(source, "read"):
+        sample = source.read(size)
+        source.seek(0)
+    else:
+        with open(source, "rb") as infile:
+            sample = infile.read(size)
+    lines = sample.decode("utf-8-sig", "replace").splitlines()
+    if len(sample) == size:
+        # The last line may be cut
+        lines = lines[:-1]
+    return list(csv.DictReader(lines, delimiter=delimiter))
+
+
+def detect_decimal(values, delimiter=","):
+    """Guesses the decimal separator ('.' or ',') of a sample of amount strings.
+
+    The last separator of an amount is its decimal one when both appear ('1.234,50') or when
+    one or two digits follow it ('-45,30'); three digits ('1,234') say nothing. Without any
+    telling amount, files delimited by ';' are taken to use decimal commas, the others points.
+    """
+    votes = {".": 0, ",": 0}
+    for value in values:
+        match = _LAST_SEPARATOR.search(value or "")
+        if match is None:
+            continue
+        separator, digits = match.groups()
+        other = "," if separator == "." else "."
+        if other in value[:match.start()] or len(digits) != 3:
+            votes[separator] += 1
+    if votes["."] != votes[","]:
+        return max(votes, key=votes.get)
+    return "," if delimiter == ";" else "."
+
+
+def read_csv_chunks(source, block_size=CSV_BLOCK_SIZE, columns=None, invalid_row_handler=None, decimal=None):
+    """Yields Arrow tables of date (string), amount (float) and label (string) from a CSV statement.
+
+    Columns are recognized by their usual names (see DATE_COLUMNS etc.) unless columns maps
+    "date", "amount" (or "debit" and "credit") and "label" to the names used by the file.
+    Malformed rows are passed to invalid_row_handler (pyarrow's callback returning "skip" or "error").
+    The decimal separator of the amounts ('.' or ',') is detected from the first rows when None.
+    """
+    header, delimiter = _read_header(source)
+    columns = dict(columns or {})
+    for role, candidates in [("date", DATE_COLUMNS), ("amount", AMOUNT_COLUMNS), ("debit", DEBIT_COLUMNS),
+                             ("credit", CREDIT_COLUMNS), ("label", LABEL_COLUMNS)]:
+        columns.setdefault(role, _find_column(header, candidates))
+    if columns["date"] is None or columns["label"] is None or (
+        columns["amount"] is None and (columns["debit"] is None or columns["credit"] is None)
+    ):
+        raise ValueError(f"Cannot find the date, amount and label columns of the statement in {header}")
+    amount_columns = [columns[role] for role in ("amount", "debit", "credit") if columns[role] is not None]
+    if decimal is None:
+        sample = _read_sample(source, delimiter)
+        decimal = detect_decimal([row.get(column) for row in sample for column in amount_columns], delimiter)
+    used = [column for column in columns.values() if column is not None]
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        parse_options=pacsv.ParseOptions(delimiter=delimiter, invalid_row_handler=invalid_row_handler),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=used, column_types={column: pa.string() for column in used}
+        ),
+    )
+    for record_batch in reader:
+        if columns["amount"] is not None:
+            amount = parse_amounts(record_batch.column(columns["amount"]), decimal)
+        else:
+            amount = pc.subtract(
+                pc.fill_null(parse_amounts(record_batch.column(columns["credit"]), decimal), 0.0),
+                pc.fill_null(parse_amounts(record_batch.column(columns["debit"]), decimal), 0.0),
+            )
+        yield pa.table({
+            "date": record_batch.column(columns["date"]), "amount": amount, "label": record_batch.column(columns["label"])
+        })
+
+
+def read_ofx_chunks(source, chunk_rows=OFX_CHUNK_ROWS):
+    """Yields Arrow tables of date, amount and label from the <STMTTRN> records of an OFX statement."""
+    if hasattr(source, "read"):
+        data = source.read()
+        mapped = None
+    else:
+        with open(source, "rb") as infile:
+            mapped = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        data = mapped
+    try:
+        rows = {"date": [], "amount": [], "label": []}
+        for transaction in _OFX_TRANSACTION.finditer(data):
+            fields = {
+                name.decode().upper(): value.strip().decode("utf-8", "replace")
+                for name, value in _OFX_FIELD.findall(transaction.group(1))
+            }
+            # DTPOSTED is YYYYMMDD[HHMMSS[.XXX][TZ]]
+            rows["date"].append(fields.get("DTPOSTED", "")[:8])
+            rows["amount"].append(fields.get("TRNAMT"))
+            rows["label"].append(fields.get("NAME") or fields.get("MEMO") or "")
+            if len(rows["date"]) >= chunk_rows:
+                yield _ofx_frame(rows)
+                rows = {"date": [], "amount": [], "label": []}
+        if rows["date"]:
+            yield _ofx_frame(rows)
+    finally:
+        if mapped is not None:
+            mapped.close()
+
+
+def _ofx_frame(rows):
+    return pa.table({
+        "date": pa.array([date or None for date in rows["date"]], pa.string()),
+        "amount": parse_amounts(pa.array(rows["amount"], pa.string())),
+        "label": pa.array(rows["label"], pa.string()),
+    })
+
+
+def parse_amounts(values, decimal="."):
+    """Parses an Arrow array of amount strings ('1,234.50', '-12.5 TND', '(40.00)') into floats (null when unreadable)."""
+    values = pc.utf8_trim_whitespace(values)
+    negative = pc.or_(pc.starts_with(values, "("), pc.ends_with(values, "-"))
+    if decimal == ",":
+        values = pc.replace_substring(pc.replace_substring(values, ".", ""), ",", ".")
+    cleaned = pc.replace_substring_regex(values, r"[^0-9.\-]", "")
+    # A sign anywhere else than first ('40.00-' was caught above)
+    cleaned = pc.replace_substring_regex(cleaned, r"(.)-", r"\1")
+    readable = pc.match_substring_regex(cleaned, r"^-?([0-9]+\.?[0-9]*|\.[0-9]+)$")
+    amounts = pc.cast(pc.if_else(readable, cleaned, pa.scalar(None, pa.string())), pa.float64())
+    return pc.if_else(negative, pc.negate(pc.abs(amounts)), amounts)
+
+
+def normalize_labels(labels):
+    """Vectorized taxonomy.normalize_label on an Arrow array: lowercase words without numbers."""
+    labels = pc.replace_substring_regex(pc.utf8_lower(labels), r"[^a-z0-9]+", " ")
+    labels = pc.replace_substring_regex(labels, r"\b[a-z]*[0-9][a-z0-9]*\b", " ")
+    return pc.fill_null(pc.utf8_trim(pc.replace_substring_regex(labels, " +", " "), " "), "")
+
+
+class StatementTotals:
+    """Running sums of a statement: expenses per (month, category) and income per month."""
+
+    def __init__(self):
+        self.expenses = {}
+        self.income = {}
+        self.rows = 0
+        self.skipped = 0
+
+    def add(self, table, taxonomy, dayfirst=False):
+        """Classifies and adds one chunk (Arrow table of date, amount, label) of transactions."""
+        self.rows += table.num_rows
+        dates = pd.to_datetime(table.column("date").to_pandas(), errors="coerce", dayfirst=dayfirst)
+        amounts = table.column("amount").to_numpy()
+        valid = dates.notna().to_numpy() & ~np.isnan(amounts)
+        self.skipped += int((~valid).sum())
+        months = periods.to_month(dates.to_numpy()[valid])
+        amounts = amounts[valid]
+
+        # Each distinct label is classified once (and cached by the taxonomy across chunks)
+        labels = pc.dictionary_encode(normalize_labels(table.column("label").filter(pa.array(valid))).combine_chunks())
+        codes = labels.indices.to_numpy(zero_copy_only=False)
+        uniques = labels.dictionary.to_pylist()
+        categories = np.array([taxonomy.classify(label) or UNCLASSIFIED for label in uniques], dtype=object)
+        spent = amounts < 0
+        expense_frame = pd.DataFrame({
+            "month": months[spent],
+            "category": categories[codes[spent]] if len(uniques) else np.array([], dtype=object),
+            "amount": -amounts[spent],
+        })
+        for (month, category), total in expense_frame.groupby(["month", "category"])["amount"].sum().items():
+            key = (periods.format_months(month), category)
+            self.expenses[key] = self.expenses.get(key, 0.0) + total
+        income_frame = pd.DataFrame({"month": months[~spent], "amount": amounts[~spent]})
+        for month, total in income_frame.groupby("month")["amount"].sum().items():
+            key = periods.format_months(month)
+            self.income[key] = self.income.get(key, 0.0) + total
+
+    def monthly_expenses(self):
+        """DataFrame of expenses, one row per 'YYYY-MM' month and one column per category."""
+        if not self.expenses:
+            return pd.DataFrame()
+        series = pd.Series(self.expenses)
+        return series.unstack(fill_value=0.0).sort_index()
+
+    def advisor_inputs(self, taxonomy, months=3):
+        """Average monthly (vital_expenses_data, non_vital_expenses_data, income, unclassified) over the last months.
+
+        The first three are the expense and income arguments of expert.main; unclassified
+        spending is returned apart for the user to assign.
+        """
+        expenses = self.monthly_expenses()
+        all_months = sorted(set(expenses.index) | set(self.income))[-months:]
+        if not all_months:
+            return {}, {}, 0.0, 0.0
+        averages = expenses.reindex(all_months, fill_value=0.0).mean() if not expenses.empty else pd.Series(dtype=float)
+        vital, non_vital = {}, {}
+        for category, amount in averages.items():
+            if category == UNCLASSIFIED or amount <= 0:
+                continue
+            (vital if taxonomy.is_mandatory(category) else non_vital)[category] = round(float(amount), 2)
+        income = round(sum(self.income.get(month, 0.0) for month in all_months) / len(all_months), 2)
+        unclassified = round(float(averages.get(UNCLASSIFIED, 0.0)), 2)
+        return vital, non_vital, income, unclassified
+
+
+def ingest_statement(source, taxonomy, name=None, dayfirst=False, columns=None, decimal=None):
+    """Streams a CSV or OFX statement (path or binary file object) into StatementTotals.
+
+    The format is taken from the extension of name (default: the path), OFX/QFX or CSV. The
+    decimal separator of CSV amounts is detected unless decimal is '.' or ','.
+    """
+    name = (name or (source if isinstance(source, str) else getattr(source, "name", ""))).lower()
+    totals = StatementTotals()
+
+    def skip_row(row):
+        totals.rows += 1
+        totals.skipped += 1
+        return "skip"
+
+    if name.endswith((".ofx", ".qfx")):
+        chunks = read_ofx_chunks(source)
+    else:
+        chunks = read_csv_chunks(source, columns=columns, invalid_row_handler=skip_row, decimal=decimal)
+    for table in chunks:
+        totals.add(table, taxonomy, dayfirst)
+    return totals
+
+
+def cli(argv=None):
+    import expert
+
+    parser = argparse.ArgumentParser(description="Monthly expense totals of a bank statement (CSV or OFX).")
+    parser.add_argument("statement", help="CSV or OFX statement export")
+    parser.add_argument("--months", type=int, default=3, help="months averaged for the advisor inputs (default: 3)")
+    parser.add_argument("--dayfirst", action="store_true", help="dates are written day first (31/01/2025)")
+    parser.add_argument("--decimal", choices=[".", ","], help="decimal separator of the amounts (default: detected)")
+    args = parser.parse_args(argv)
+    totals = ingest_statement(args.statement, expert.taxonomy, dayfirst=args.dayfirst, decimal=args.decimal)
+    print(f"{totals.rows} transactions, {totals.skipped} skipped")
+    with pd.option_context("display.width", 200, "display.max_columns", 50):
+        print(totals.monthly_expenses().round(2))
+    vital, non_vital, income, unclassified = totals.advisor_inputs(expert.taxonomy, args.months)
+    print("vital expenses:", vital)
+    print("non vital expenses:", non_vital)
+    print("income:", income, "unclassified:", unclassified)
+
+
+if __name__ == "__main__":
+    cli()
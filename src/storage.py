@@ -0,0 +1,360 @@
+import atexit
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+# Legacy whole-document store and the default per-user database
+RESULT_JSON_PATH = "result.json"
+RESULT_DB_PATH = "result.db"
+# "sqlite" (default) or "json"
+STORAGE_BACKEND = os.environ.get("FIN_GENIUS_STORAGE", "sqlite")
+# Seconds between two flushes of the write-behind queue, and users queued before an early flush
+FLUSH_INTERVAL = float(os.environ.get("FIN_GENIUS_FLUSH_INTERVAL", "0.2"))
+FLUSH_MAX_USERS = 256
+
+
+def thread_connection(local, path):
+    """Returns the SQLite connection (WAL mode, autocommit) of the current thread, opening it if needed.
+
+    sqlite3 connections cannot be shared between threads, so `local` (a threading.local) keeps one per thread.
+    """
+    connection = getattr(local, "connection", None)
+    if connection is None:
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        local.connection = connection
+    return connection
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Holds a lock on the file at path (created if needed), seen by other processes where fcntl exists.
+
+    The lock is exclusive, or shared with the other holders of a shared lock when shared is True.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class UserStore:
+    """Per-user record storage used by the advisor and charts pages."""
+
+    def get(self, username):
+        """Returns the record of username, or None if there is none."""
+        raise NotImplementedError
+
+    def update(self, username, fields):
+        """Merges fields into the record of username (creating it if needed)."""
+        raise NotImplementedError
+
+    def update_many(self, updates):
+        """Applies {username: fields} as one batch of update() calls."""
+        for username, fields in updates.items():
+            self.update(username, fields)
+
+    def version(self, username):
+        """Returns a counter that changes every time the record of username is updated."""
+        raise NotImplementedError
+
+    def usernames(self):
+        raise NotImplementedError
+
+
+class JsonFileStore(UserStore):
+    """The original result.json layout: one JSON document holding every user."""
+
+    def __init__(self, path=RESULT_JSON_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return {}
+        try:
+            with open(self.path, "r") as infile:
+                return json.load(infile)
+        except json.JSONDecodeError:
+            return {}
+
+    def get(self, username):
+        return self._load().get(username) or None
+
+    @contextmanager
+    def _locked(self):
+        # The lock file sits next to the document: the document itself is replaced on every write
+        with self._lock, file_lock(self.path + ".lock"):
+            yield
+
+    def update(self, username, fields):
+        self.update_many({username: fields})
+
+    def update_many(self, updates):
+        # Read-modify-write under an exclusive lock (other processes included), then an atomic
+        # replace, so readers never see a partial document and concurrent writers never lose updates
+        with self._locked():
+            existing_data = self._load()
+            for username, fields in updates.items():
+                existing_data.setdefault(username, {}).update(fields)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            with tempfile.NamedTemporaryFile("w", dir=directory, prefix=".result-", suffix=".json", delete=False) as outfile:
+                json.dump(existing_data, outfile, indent=4)
+                outfile.flush()
+                os.fsync(outfile.fileno())
+            os.replace(outfile.name, self.path)
+
+    def version(self, username):
+        # The whole document is rewritten on every update, so its mtime is the version
+        return os.stat(self.path).st_mtime_ns if os.path.exists(self.path) else 0
+
+    def usernames(self):
+        return list(self._load().keys())
+
+
+class SqliteStore(UserStore):
+    """SQLite (WAL mode) store with one row per user, so reads and writes touch a single record."""
+
+    def __init__(self, path=RESULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS user_records (
+                    username TEXT PRIMARY KEY,
+                    record TEXT NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 1,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+
+    def _connection(self):
+        return thread_connection(self._local, self.path)
+
+    def get(self, username):
+        row = self._connection().execute(
+            "SELECT record FROM user_records WHERE username = ?", (username,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, username, fields):
+        self.update_many({username: fields})
+
+    def update_many(self, updates):
+        connection = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent sessions cannot lose updates
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for username, fields in updates.items():
+                row = connection.execute(
+                    "SELECT record FROM user_records WHERE username = ?", (username,)
+                ).fetchone()
+                record = json.loads(row[0]) if row else {}
+                record.update(fields)
+                connection.execute(
+                    """INSERT INTO user_records (username, record, version, updated_at) VALUES (?, ?, 1, ?)
+                    ON CONFLICT(username) DO UPDATE SET
+                        record = excluded.record, version = version + 1, updated_at = excluded.updated_at""",
+                    (username, json.dumps(record), time.time()),
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def version(self, username):
+        row = self._connection().execute(
+            "SELECT version FROM user_records WHERE username = ?", (username,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def usernames(self):
+        return [row[0] for row in self._connection().execute("SELECT username FROM user_records")]
+
+    def is_empty(self):
+        return self._connection().execute("SELECT 1 FROM user_records LIMIT 1").fetchone() is None
+
+
+class WriteBehindStore(UserStore):
+    """Write-behind queue in front of another store, shared by every session of the process.
+
+    update() only merges the fields into the pending record of the user, so repeated updates of
+    one user coalesce into a single write. A background thread hands the pending records to the
+    underlying store as one batch every `interval` seconds, or as soon as `max_users` users are
+    waiting. Reads see the pending fields and the ones being written until the write commits,
+    and close() (registered at exit) drains the queue. A failing record only holds back its own
+    user: the others of the batch are still written.
+    """
+
+    def __init__(self, store, interval=FLUSH_INTERVAL, max_users=FLUSH_MAX_USERS):
+        self.store = store
+        self.interval = interval
+        self.max_users = max_users
+        self._pending = {}
+        # Batch handed to the store by the running flush, still merged by get() until it commits
+        self._in_flight = {}
+        # Bumped on every pending update, so versions change before the flush too
+        self._sequence = {}
+        self._lock = threading.Lock()
+        # Serializes flushes: the flusher thread, early flushes and close()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.flushes = 0
+        self.coalesced = 0
+        self._thread = threading.Thread(target=self._run, name="store-write-behind", daemon=True)
+        self._thread.start()
+
+    def get(self, username):
+        # Overlays are read before the store: they are only cleared once their write has committed
+        with self._lock:
+            overlay = {**self._in_flight.get(username, {}), **self._pending.get(username, {})}
+        record = self.store.get(username)
+        if overlay:
+            record = {**(record or {}), **overlay}
+        return record
+
+    def update(self, username, fields):
+        if self._closed:
+            self.store.update(username, fields)
+            return
+        with self._lock:
+            if username in self._pending:
+                self.coalesced += 1
+            self._pending.setdefault(username, {}).update(fields)
+            self._sequence[username] = self._sequence.get(username, 0) + 1
+            full = len(self._pending) >= self.max_users
+        if full:
+            self._wake.set()
+
+    def version(self, username):
+        with self._lock:
+            sequence = self._sequence.get(username, 0)
+        return (self.store.version(username), sequence)
+
+    def usernames(self):
+        with self._lock:
+            pending = list(self._in_flight) + list(self._pending)
+        return list(dict.fromkeys(self.store.usernames() + pending))
+
+    def flush(self):
+        """Writes every pending record to the underlying store. Returns the number of users written.
+
+        Records that cannot be serialized are dropped (they would fail forever). When the batch
+        write fails, its users are written one by one and only the failing ones are queued again;
+        if every one of them fails, the store itself is failing and the error is raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+            try:
+                for username, fields in list(batch.items()):
+                    try:
+                        json.dumps(fields)
+                    except (TypeError, ValueError) as e:
+                        print(f"Write-behind: dropping the update of {username}, it cannot be stored: {e}")
+                        del batch[username]
+                if not batch:
+                    return 0
+                try:
+                    with metrics.time("fin_genius_save_user_data_seconds"):
+                        self.store.update_many(batch)
+                    failed = {}
+                except Exception as e:
+                    failed = {}
+                    for username, fields in batch.items():
+                        try:
+                            self.store.update(username, fields)
+                        except Exception:
+                            failed[username] = fields
+                    self._requeue(failed)
+                    if len(failed) == len(batch):
+                        raise e
+                    print(f"Write-behind: {len(failed)} of {len(batch)} updates failed and are queued again: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight = {}
+            self.flushes += 1
+            return len(batch) - len(failed)
+
+    def _requeue(self, batch):
+        # Under any newer fields, to be retried by the next flush
+        with self._lock:
+            for username, fields in batch.items():
+                self._pending[username] = {**fields, **self._pending.get(username, {})}
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Write-behind flush failed: {e}")
+
+    def close(self):
+        """Stops the background flusher and writes what is still pending."""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), "flushes": self.flushes, "coalesced": self.coalesced}
+
+
+def import_result_json(store, json_path=RESULT_JSON_PATH):
+    """One-shot import of every user of a legacy result.json into store. Returns the number of users imported."""
+    if not os.path.exists(json_path) or os.path.getsize(json_path) == 0:
+        return 0
+    with open(json_path, "r") as infile:
+        try:
+            existing_data = json.load(infile)
+        except json.JSONDecodeError:
+            return 0
+    store.update_many({username: record for username, record in existing_data.items() if record})
+    return len(existing_data)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Returns the process-wide store selected by FIN_GENIUS_STORAGE.
+
+    The first time the SQLite database is created, users from an existing result.json are imported into it.
+    Writes go through a WriteBehindStore, drained when the process exits.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if STORAGE_BACKEND == "json":
+                store = JsonFileStore()
+            else:
+                store = SqliteStore()
+                if store.is_empty():
+                    import_result_json(store)
+            _store = WriteBehindStore(store)
+            atexit.register(_store.close)
+        return _store
@@ -0,0 +1,161 @@
+import os
+import re
+from functools import lru_cache
+from types import MappingProxyType
+
+import yaml
+
+# Optional YAML file extending the built-in categories (see categories.yaml)
+TAXONOMY_PATH = os.environ.get(
+    "FIN_GENIUS_TAXONOMY", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "categories.yaml")
+)
+GROUPS = ("vital", "non_vital")
+# Minimum Dice similarity between the trigrams of a label and of a category term
+FUZZY_THRESHOLD = 0.6
+# Longest run of words looked up as one term ("uber eats", "gym membership")
+MAX_PHRASE_WORDS = 3
+CLASSIFY_CACHE_SIZE = 200_000
+
+_SEPARATORS = re.compile(r"[^a-z0-9]+")
+_DIGIT = re.compile(r"[0-9]")
+
+
+def normalize_label(label):
+    """Lowercase words of a label without numbers (amounts, references): 'NETFLIX.COM REF866579' -> 'netflix com'."""
+    return " ".join(word for word in _SEPARATORS.sub(" ", str(label).lower()).split() if not _DIGIT.search(word))
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _parse_node(value):
+    """A YAML node is a list of aliases (leaf), a mapping of subcategories, or empty."""
+    if value is None:
+        return {"aliases": (), "children": {}}
+    if isinstance(value, (list, tuple)):
+        return {"aliases": tuple(str(alias) for alias in value), "children": {}}
+    if isinstance(value, dict):
+        return {"aliases": (), "children": {str(name): _parse_node(child) for name, child in value.items()}}
+    raise ValueError(f"Invalid taxonomy node: {value!r}")
+
+
+def _merge_nodes(base, extra):
+    children = dict(base["children"])
+    for name, node in extra["children"].items():
+        children[name] = _merge_nodes(children[name], node) if name in children else node
+    aliases = base["aliases"] + tuple(alias for alias in extra["aliases"] if alias not in base["aliases"])
+    return {"aliases": aliases, "children": children}
+
+
+class CategoryTaxonomy:
+    """Immutable two-group (vital / non_vital) hierarchy of expense categories.
+
+    The categories used by the expert system are the children of the groups; deeper levels are
+    subcategories, and every node may list aliases (merchant names, keywords). Lookups go through
+    frozen hash maps, and free-text labels are classified by exact term lookup on runs of words,
+    then by trigram similarity through an inverted index built once per taxonomy.
+    """
+
+    def __init__(self, tree):
+        self._build(_parse_node(tree))
+
+    def _build(self, root):
+        unknown = set(root["children"]) - set(GROUPS)
+        if unknown:
+            raise ValueError(f"Taxonomy groups must be {GROUPS}, got {sorted(unknown)}")
+        self._root = root
+        group_of, paths, category_of = {}, {}, {}
+
+        def walk(node, path, category):
+            for alias in node["aliases"]:
+                category_of.setdefault(normalize_label(alias), category)
+            for name, child in node["children"].items():
+                walk(child, path + (name,), category or name)
+                paths[name] = path + (name,)
+
+        for group in GROUPS:
+            node = root["children"].get(group, _parse_node(None))
+            for name, child in node["children"].items():
+                group_of[name] = group
+                walk(child, (group, name), name)
+                paths[name] = (group, name)
+        # Category and subcategory names take precedence over aliases
+        for name, path in paths.items():
+            category_of[normalize_label(name)] = path[1]
+
+        self.group_of = MappingProxyType(group_of)
+        self.paths = MappingProxyType(paths)
+        self.mandatory = frozenset(name for name, group in group_of.items() if group == "vital")
+        self._category_of = MappingProxyType(category_of)
+
+        self._terms = tuple(category_of)
+        self._term_categories = tuple(category_of.values())
+        self._term_is_phrase = tuple(" " in term for term in self._terms)
+        term_trigrams = [trigrams(term) for term in self._terms]
+        self._term_sizes = tuple(len(grams) for grams in term_trigrams)
+        postings = {}
+        for term_id, grams in enumerate(term_trigrams):
+            for gram in grams:
+                postings.setdefault(gram, []).append(term_id)
+        self._postings = MappingProxyType({gram: tuple(ids) for gram, ids in postings.items()})
+        self.classify = lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(self._classify)
+
+    def categories(self, group=None):
+        """Category names, in taxonomy order, optionally restricted to one group."""
+        return [name for name, name_group in self.group_of.items() if group in (None, name_group)]
+
+    def is_mandatory(self, category):
+        return category in self.mandatory
+
+    def with_categories(self, tree):
+        """Returns a new taxonomy extended with tree (same layout), e.g. the categories defined by a user."""
+        taxonomy = CategoryTaxonomy.__new__(CategoryTaxonomy)
+        taxonomy._build(_merge_nodes(self._root, _parse_node(tree)))
+        return taxonomy
+
+    def _classify(self, label):
+        """Returns the category of a free-text label (merchant, description), or None."""
+        text = normalize_label(label)
+        if not text:
+            return None
+        category = self._category_of.get(text)
+        if category is not None:
+            return category
+        words = text.split()
+        # Longest runs of words first, so "uber eats" wins over "uber"
+        for size in range(min(MAX_PHRASE_WORDS, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                category = self._category_of.get(" ".join(words[start:start + size]))
+                if category is not None:
+                    return category
+        best_score, best_category = 0.0, None
+        for query in [text] + [word for word in words if len(word) >= 4]:
+            query_trigrams = trigrams(query)
+            shared = {}
+            for gram in query_trigrams:
+                for term_id in self._postings.get(gram, ()):
+                    shared[term_id] = shared.get(term_id, 0) + 1
+            for term_id, count in shared.items():
+                # One word of the label only stands for a one-word term: "power" is not "power bill"
+                if query is not text and self._term_is_phrase[term_id]:
+                    continue
+                score = 2 * count / (len(query_trigrams) + self._term_sizes[term_id])
+                if score > best_score:
+                    best_score, best_category = score, self._term_categories[term_id]
+        return best_category if best_score >= FUZZY_THRESHOLD else None
+
+    def classify_many(self, labels):
+        """Classifies a sequence of labels, each distinct label once."""
+        categories = {label: self.classify(label) for label in set(labels)}
+        return [categories[label] for label in labels]
+
+
+def load_taxonomy(vital, non_vital, path=TAXONOMY_PATH):
+    """The built-in vital / non_vital categories, extended with the YAML file at path when it exists."""
+    taxonomy = CategoryTaxonomy({"vital": {name: None for name in vital}, "non_vital": {name: None for name in non_vital}})
+    if path and os.path.exists(path):
+        with open(path) as infile:
+            taxonomy = taxonomy.with_categories(yaml.safe_load(infile) or {})
+    return taxonomy
@@ -1,11 +1,21 @@
 import streamlit as st
-from datetime import datetime
 import sys, os
-import json
-import time
+from functools import partial
 
 sys.path.append(os.path.abspath("src"))
 import expert
+import periods
+from result_cache import cached_main
+from storage import get_store
+from analytics import get_analytics
+from history import get_history, numeric_results, track_progress
+from taxonomy import normalize_label
+from statements import ingest_statement
+from expense_cuts import optimize_cuts
+from jobs import DONE, FAILED, PENDING, RUNNING, get_executor
+
+# Seconds between two checks of a submission running in the background
+JOB_POLL_INTERVAL = 0.5
 
 if "result" not in st.session_state:
     st.session_state.result = {}  # Initialize with None
@@ -42,7 +52,7 @@ def display_result(result):
     for elt in result.keys():
 
         # Skip follow recommendations as they've already been handled
-        if elt in ["follow_recommendations_success", "follow_recommendations_warning", "goal_description", "budget_adjustement_solution_1", "budget_adjustement_solution_2"]:
+        if elt in ["follow_recommendations_success", "follow_recommendations_warning", "goal_description", "budget_adjustement_solution_1", "budget_adjustement_solution_2", "expense_cuts"]:
             continue
             
         if elt == "rule_50_30_20":
@@ -93,7 +103,7 @@ def display_result(result):
 
     # Process all other results except rule_50_30_20
     for elt in result.keys():
-        if elt in ["follow_recommendations_success", "follow_recommendations_warning", "goal_description", "budget_adjustement_solution_1", "budget_adjustement_solution_2", "rule_50_30_20"]:
+        if elt in ["follow_recommendations_success", "follow_recommendations_warning", "goal_description", "budget_adjustement_solution_1", "budget_adjustement_solution_2", "rule_50_30_20", "expense_cuts"]:
             continue
         # Other results with card-like presentation
         with st.container():
@@ -101,6 +111,21 @@ def display_result(result):
             st.info(str(result[elt]), icon="ℹ️")
             st.markdown("---")   
 
+    if result.get("expense_cuts"):
+        expense_cuts = result["expense_cuts"]
+        st.markdown("#### ✂️ Where to cut")
+        for note in expense_cuts["notes"]:
+            st.warning(note, icon="⚠️")
+        if not expense_cuts["feasible"]:
+            st.info(
+                f"Even cutting every discretionary expense as far as possible would leave "
+                f"{expense_cuts['shortfall']:.2f} TND per month missing.", icon="ℹ️"
+            )
+        for rank, plan in enumerate(expense_cuts["plans"][:3], start=1):
+            cuts = ", ".join(f"{category} -{amount:.2f}" for category, amount in plan["cuts"].items())
+            st.markdown(f"**Plan {rank}** ({plan['categories_cut']} categories, {plan['total_cut']:.2f} TND per month): {cuts}")
+        st.markdown("---")
+
     # Add helpful context at the bottom
     with st.expander("💡 Understanding Your Results"):
         st.markdown("""
@@ -113,21 +138,83 @@ def display_result(result):
         """)
 
 
-def get_Timeline(date_string):
-    # Get the current date
-    current_date = datetime.now()
-    months_difference = 0
+def get_user_taxonomy(username):
+    # Built-in categories plus the ones the user added, rebuilt only when those change
+    custom_categories = (get_store().get(username) or {}).get("custom_categories")
+    if st.session_state.get("taxonomy_source") != custom_categories or "taxonomy" not in st.session_state:
+        st.session_state.taxonomy = (
+            expert.taxonomy.with_categories(custom_categories) if custom_categories else expert.taxonomy
+        )
+        st.session_state.taxonomy_source = custom_categories
+    return st.session_state.taxonomy
+
+
+def add_custom_category(username, name, vital):
+    custom_categories = (get_store().get(username) or {}).get("custom_categories") or {}
+    group = "vital" if vital else "non_vital"
+    custom_categories.setdefault(group, {})[name] = None
+    get_store().update(username, {"custom_categories": custom_categories})
+
+
+def analyze_submission(
+        username, vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline
+    ):
+    # Runs in a background job: the result is shown as soon as this returns
+    result = cached_main(
+        vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline
+    )
+    # Progress against the milestone of the previous submission of the same goal
+    progress = track_progress(get_history().latest(username), saving, goal_description, saving_target)
+    if progress:
+        result["progress"] = progress
+    if result.get("feasibility_check") == expert.NOT_FEASIBLE_MESSAGE:
+        # Smallest sets of discretionary cuts that would make the goal feasible
+        result["expense_cuts"] = optimize_cuts(
+            income, saving, saving_target, saving_timeline, vital_expenses_data, non_vital_expenses_data
+        )
+    return result
+
+
+def persist_submission(
+        username, vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline,
+        result
+    ):
+    # Runs in the same job once the result is published, so the session never waits for the disk
+    # History first: saving the record bumps its version, which invalidates the cached charts
+    record_submission(
+        username, result, vital_expenses_data, non_vital_expenses_data,
+        goal_description, income, saving_target, saving, saving_timeline
+    )
+    save_user_data(
+        username, result, vital_expenses_data, non_vital_expenses_data, income, saving, saving_target, saving_timeline
+    )
+
 
-    # Calculate the difference in years and months
-    years_difference = date_string.year - current_date.year
-    if years_difference == 0:
-        return date_string.month - current_date.month
-    elif years_difference >= 2:
-        months_difference += years_difference * 12
-    remaining_months_untill_end_year_current_date = 12 - current_date.month
-    months_difference += date_string.month + remaining_months_untill_end_year_current_date
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def poll_submission():
+    status, result, error = get_executor().status(st.session_state.job_id)
+    if status in (PENDING, RUNNING):
+        with st.spinner("Analyzing your finances..."):
+            st.caption("Your results will open as soon as they are ready.")
+        return
+    get_executor().forget(st.session_state.job_id)
+    del st.session_state.job_id
+    if status == DONE:
+        st.session_state.result = {
+            "data": result,
+            "done": True
+        }
+        st.session_state.show_result = True
+    elif status == FAILED:
+        st.session_state.job_error = error
+    else:
+        st.session_state.job_error = "the submission expired"
+    st.rerun()
 
-    return months_difference
+
+def get_Timeline(date_string):
+    # Calendar months between the current month and the target date
+    return int(periods.months_between(periods.current_month(), date_string))
 
 st.title("💡 Financial Advisor")
 
@@ -145,25 +232,62 @@ if "errors" not in st.session_state:
         "expenses": {}
     }
 
+user_taxonomy = get_user_taxonomy(st.session_state["authenticated_user"])
+
+with st.expander("➕ Add your own expense category"):
+    new_category = st.text_input("Category name", placeholder="e.g. Childcare")
+    new_category_vital = st.checkbox("This is a vital (mandatory) expense")
+    if st.button("Add category"):
+        new_category = "_".join(normalize_label(new_category).split())
+        if not new_category:
+            st.error("❌ Category name cannot be empty.")
+        elif new_category in user_taxonomy.group_of:
+            st.warning(f"{new_category} is already a category.", icon="⚠️")
+        else:
+            add_custom_category(st.session_state["authenticated_user"], new_category, new_category_vital)
+            st.rerun()
+
+with st.expander("📄 Import a bank statement"):
+    statement_file = st.file_uploader("CSV or OFX export of your bank account", type=["csv", "ofx", "qfx"])
+    statement_dayfirst = st.checkbox("Dates are written day first (31/01/2025)")
+    statement_decimal = st.radio(
+        "Decimal separator of the amounts", ["Detect", ".", ","], horizontal=True,
+        help="Detected from the first rows of the statement by default",
+    )
+    if statement_file is not None:
+        # Ingested once per uploaded file, the form is then prefilled with its monthly averages
+        statement_key = (statement_file.file_id, statement_dayfirst, statement_decimal)
+        if st.session_state.get("statement_key") != statement_key:
+            try:
+                totals = ingest_statement(
+                    statement_file, user_taxonomy, name=statement_file.name, dayfirst=statement_dayfirst,
+                    decimal=None if statement_decimal == "Detect" else statement_decimal,
+                )
+                st.session_state.statement = totals.advisor_inputs(user_taxonomy)
+            except ValueError as e:
+                st.session_state.statement = None
+                st.error(f"❌ Cannot read this statement: {e}")
+            st.session_state.statement_key = statement_key
+        if st.session_state.statement:
+            unclassified = st.session_state.statement[3]
+            st.success("✅ Expenses and income prefilled with the monthly averages of the last 3 months.")
+            if unclassified:
+                st.warning(f"{unclassified:.2f} per month could not be assigned to a category.", icon="⚠️")
+
+statement = st.session_state.get("statement") if statement_file is not None else None
+statement_expenses = {**statement[0], **statement[1]} if statement else {}
+
 # Move multiselect outside the form
 options = st.multiselect(
     "Select all your expenses categories",
-    expert.vital_expenses + expert.non_mandatory_expenses,
-    [],
+    user_taxonomy.categories(),
+    list(statement_expenses),
     help="Choose all the categories of expenses applicable to you.",
 )
 
-def save_user_data(username, result, vital_expenses_data, non_vital_expenses_data, income):
-    # First, read existing data if file exists
-    existing_data = {}
-    if os.path.exists("result.json"):
-        try:
-            with open("result.json", "r") as infile:
-                existing_data = json.load(infile)
-        except json.JSONDecodeError:
-            # Handle case where file exists but is empty or invalid
-            existing_data = {}
-
+def save_user_data(
+        username, result, vital_expenses_data, non_vital_expenses_data, income, saving=None, saving_target=None, saving_timeline=None
+    ):
     user_data = {
         "result": result,
         "vital_expenses": vital_expenses_data,
@@ -171,19 +295,44 @@ def save_user_data(username, result, vital_expenses_data, non_vital_expenses_dat
         "income": income
     }
 
-    # Update the existing data with new user data
-    if username not in existing_data:
-        existing_data[username] = {}
-    existing_data[username].update(user_data)
+    # Queued for the write-behind flusher (which times the actual write)
+    try:
+        get_store().update(username, user_data)
+    except Exception as e:
+        return False, f"Error saving data: {str(e)}"
 
-    # Write the updated data back to file
+    # The numbers of the saved result also go to the cross-user analytics dataset
+    inputs = {"income": income, "saving": saving, "saving_target": saving_target, "saving_timeline": saving_timeline}
     try:
-        with open("result.json", "w") as outfile:
-            json.dump(existing_data, outfile, indent=4)
+        get_analytics().append(username, inputs, numeric_results(
+            result, income, saving, saving_target, saving_timeline, vital_expenses_data, non_vital_expenses_data
+        ))
         return True, "Data saved successfully"
     except Exception as e:
         return False, f"Error saving data: {str(e)}"
 
+def record_submission(
+        username, result, vital_expenses_data, non_vital_expenses_data, goal_description, income, saving_target, saving, saving_timeline
+    ):
+    # Every submission is appended to the user's history (used for progress tracking and trends)
+    inputs = {
+        "goal_description": goal_description,
+        "income": income,
+        "saving": saving,
+        "saving_target": saving_target,
+        "saving_timeline": saving_timeline,
+        "vital_expenses": vital_expenses_data,
+        "non_vital_expenses": non_vital_expenses_data,
+    }
+    results = numeric_results(
+        result, income, saving, saving_target, saving_timeline, vital_expenses_data, non_vital_expenses_data
+    )
+    try:
+        get_history().append(username, inputs, results)
+        return True, "Submission recorded successfully"
+    except Exception as e:
+        return False, f"Error recording submission: {str(e)}"
+
 
 # Form for inputs
 with st.form("ExpertForm"):
@@ -195,7 +344,7 @@ with st.form("ExpertForm"):
         # Income input
         income = st.number_input(
             "💰 What's your monthly income",
-            value=None,
+            value=statement[2] if statement and statement[2] > 0 else None,
             placeholder="Enter your salary...",
             help="Provide your net monthly income after taxes.",
         )
@@ -252,14 +401,14 @@ with st.form("ExpertForm"):
     for expense_category in options:
         expense_cost = st.number_input(
             expense_category,
-            value=None,
+            value=statement_expenses.get(expense_category),
             placeholder="Enter the cost...",
             help=f"Provide the cost associated with {expense_category}.",
         )
         if expense_category in st.session_state.errors["expenses"] and st.session_state.errors["expenses"][expense_category]:
             st.error(f"❌ {st.session_state.errors['expenses'][expense_category]}")
         
-        if expert.verifyExpenseIsMandatory(expense_category):
+        if user_taxonomy.is_mandatory(expense_category):
             vital_expenses_data[expense_category] = expense_cost
         else:
             non_vital_expenses_data[expense_category] = expense_cost
@@ -270,7 +419,6 @@ with st.form("ExpertForm"):
 
 # Handle form submission and validation
 if submit_button:
-    result = {}
 # Reset error messages
     st.session_state.errors = {
         "income": "",
@@ -316,42 +464,44 @@ if submit_button:
                 st.session_state.errors["expenses"][category] = "Cost must be a positive number."
                 has_errors = True
 
-    # If no errors, process the form
+    # If no errors, the form is processed in the background and polled below
     if not has_errors:
-        result = expert.main(
-            vital_expenses_data,
-            non_vital_expenses_data,
-            goal_description,
-            income,
-            saving_target,
-            saving,
-            get_Timeline(saving_timeline),
+        timeline_months = get_Timeline(saving_timeline)
+        job_id = get_executor().submit(
+            analyze_submission, st.session_state["authenticated_user"], vital_expenses_data, non_vital_expenses_data,
+            goal_description, income, saving_target, saving, timeline_months,
+            then=partial(
+                persist_submission, st.session_state["authenticated_user"], vital_expenses_data, non_vital_expenses_data,
+                goal_description, income, saving_target, saving, timeline_months
+            ),
         )
-        st.session_state.result = {
-            "data": result,
-            "done": True
-        }        
-        st.markdown("""
-            <style>
-            [data-testid="stToast"] {
-                background-color: #4CAF50 !important; /* Green background */
-                color: white !important; /* White text */
-                border-radius: 8px; /* Rounded corners */
-                font-weight: bold; /* Bold text */
-            }
-            [data-testid="stToast"] svg {
-                fill: white !important; /* Ensure the icon color is white */
-            }
-            </style>
-        """, unsafe_allow_html=True)
-        st.toast('Charts submitted successfully! View results.', icon='✅')
-        time.sleep(1)
-        st.success("✅ Form submitted successfully! View results.")
-        display_result(result)
-
-        save_user_data(st.session_state["authenticated_user"], result, vital_expenses_data, non_vital_expenses_data, income)
+        if job_id is None:
+            st.error("❌ The advisor is busy right now, please submit again in a moment.")
+        else:
+            st.session_state.job_id = job_id
     else :
         st.rerun()
-    if(not st.session_state.result):
-        # Force a rerun to show errors immediately
-        st.rerun()
\ No newline at end of file
+
+if "job_id" in st.session_state:
+    poll_submission()
+
+if "job_error" in st.session_state:
+    st.error(f"❌ Your submission could not be analyzed: {st.session_state.pop('job_error')}")
+
+if st.session_state.pop("show_result", False):
+    st.markdown("""
+        <style>
+        [data-testid="stToast"] {
+            background-color: #4CAF50 !important; /* Green background */
+            color: white !important; /* White text */
+            border-radius: 8px; /* Rounded corners */
+            font-weight: bold; /* Bold text */
+        }
+        [data-testid="stToast"] svg {
+            fill: white !important; /* Ensure the icon color is white */
+        }
+        </style>
+    """, unsafe_allow_html=True)
+    st.toast('Charts submitted successfully! View results.', icon='✅')
+    st.success("✅ Form submitted successfully! View results.")
+    display_result(st.session_state.result["data"])
@@ -1,12 +1,25 @@
 import streamlit as st
 import pandas as pd
-import json , re
+import json
 import plotly.express as px
 import os
-
-#date import
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+import sys
+
+sys.path.append(os.path.abspath("src"))
+from storage import get_store
+from history import get_history
+from metrics import metrics
+from chart_data import HISTORY_RANGES, chart_data_cache, savings_history_frame
+from chart_figures import (
+    figure_cache,
+    expenses_figure,
+    feasibility_surface_figure,
+    income_proportion_figure,
+    rule_50_30_20_figure,
+    saving_plans_figure,
+    savings_history_figure,
+    savings_trend_figure,
+)
 
 
 # Page Title
@@ -15,59 +28,12 @@ st.write("Welcome to the Charts Dashboard! Explore insights with interactive cha
 
 username = st.session_state["authenticated_user"]
 
-#  target_timeline is a string of the format  example: 2025-08
-def generate_timeline(timeline_length) : 
-    timeline_list = []
-    date_now = datetime.now()
-    for i in range(1,timeline_length+1):
-        date_next_month = date_now + relativedelta(months=1)
-        timeline_list.append(date_next_month.strftime("%Y-%m") )
-        date_now = date_next_month
-    print(timeline_list)
-    return timeline_list
-
-
-
 # Chart for solution proposed from the expert advisor (with timelines)
-def display_line_charts(data):
-    print()
+def display_line_charts(data, chart_data):
     st.subheader("Proposed monthly savings with timeline")
-    
-    # Extract the two saving plans and their respective lengths
-    length_1 = int(data["budget_adjustement_solution_1"][1][-2:])
-    length_2 = int(data["budget_adjustement_solution_2"][1][-2:])
-    
-    # Determine the maximum length
-    max_length = max(length_1, length_2)
-
-    first_saving_plan = generate_timeline(length_1)
-    second_saving_plan = generate_timeline(length_2)
-
-    
-    # Fill shorter arrays with 0
-    first_saving_plan_data = [data["budget_adjustement_solution_1"][0]] * length_1 + [0] * (max_length - length_1)
-    second_saving_plan_data = [data["budget_adjustement_solution_2"][0]] * length_2 + [0] * (max_length - length_2)
-    
-    # Create a DataFrame
-    chart_data = pd.DataFrame(
-        {
-            # "Month": list(range(1, max_length + 1)),  # X-axis for months
-            "Month": first_saving_plan,  # X-axis for months
-            "Needed savings per month": first_saving_plan_data,
-            "Current savings per month": second_saving_plan_data,
-        }
-    )
-     # Create a Plotly chart with axis labels
-    fig = px.line(
-        chart_data, 
-        x="Month", 
-        y=["Needed savings per month", "Current savings per month"],
-        labels={"value": "Savings Amount (TND)", "variable": "Saving Plan"},
-        title=data["goal_description"]
+    fig = figure_cache.get(
+        username, version, "saving_plans", lambda: saving_plans_figure(chart_data, data["goal_description"])
     )
-    fig.update_yaxes(title_text="Savings Amount (TND)")  # Y-axis label
-    fig.update_xaxes(title_text="Months")             # X-axis label
-    
     # Plot the line chart
     st.plotly_chart(fig)
     
@@ -76,41 +42,17 @@ def display_line_charts(data):
 
 
 
-def vital_expenses_by_category(data):
+def vital_expenses_by_category(chart_data):
     st.subheader("Vital Expenses by category")
-    chart_data = pd.DataFrame(
-            {
-                "Category": data["vital_expenses"].keys(),
-                "Expense value": data["vital_expenses"].values(),
-            }
-        )
-    bar_chart1 = px.bar(
-        chart_data,
-        x="Category",
-        y="Expense value",
-        title="Vital expenses by Category",
-        color="Category",
-        template="plotly_dark",
-        text_auto=True
+    bar_chart1 = figure_cache.get(
+        username, version, "vital_expenses", lambda: expenses_figure(chart_data, "Vital expenses by Category")
     )
     st.plotly_chart(bar_chart1, use_container_width=True)
 
-def non_vital_expenses_by_category(data):
+def non_vital_expenses_by_category(chart2_data):
     st.subheader("Non Vital Expenses by category")
-    chart2_data = pd.DataFrame(
-            {
-                "Category": data["non_vital_expenses"].keys(),
-                "Expense value": data["non_vital_expenses"].values(),
-            }
-        )
-    bar_chart2 = px.bar(
-        chart2_data,
-        x="Category",
-        y="Expense value",
-        title="Non-vital expenses by Category",
-        color="Category",
-        template="plotly_dark",
-        text_auto=True
+    bar_chart2 = figure_cache.get(
+        username, version, "non_vital_expenses", lambda: expenses_figure(chart2_data, "Non-vital expenses by Category")
     )
     st.plotly_chart(bar_chart2, use_container_width=True)
 
@@ -133,32 +75,35 @@ def vital_expenses_proportion(data):
     )
     st.plotly_chart(pie_chart1, use_container_width=True)
 
-def income_pie_chart(data):
+def income_pie_chart(chart_data):
     st.subheader("Income Proportion by Category")
-    expenses=data["non_vital_expenses"]
-    expenses.update(data["vital_expenses"])
-    match = re.search(r":\s*(\d+)", data["result"]["savings_rate"])
-    if match:
-        savings_rate = int(match.group(1))
-        expenses.update({"savings rate" : savings_rate})
-    chart_data = pd.DataFrame(
-            {
-                "Category": expenses.keys(),
-                "Expenses": expenses.values(),
-                "Income": [data["income"]] * len(expenses.keys())
-            }
-        )
-    chart_data["Proportion (%)"] = (chart_data["Expenses"] / chart_data["Income"]) * 100
-    proportion_chart = px.pie(
-        chart_data,
-        names="Category",
-        values="Proportion (%)",
-        title="Income Proportion by Category",
-        color_discrete_sequence=px.colors.sequential.RdBu
+    proportion_chart = figure_cache.get(
+        username, version, "income_proportion", lambda: income_proportion_figure(chart_data)
     )
     st.plotly_chart(proportion_chart, use_container_width=True)
 
-def rule_50_30_20_chart(data):
+def savings_trend_chart(chart_data):
+    st.subheader("Savings progress over time")
+    fig = figure_cache.get(username, version, "savings_trend", lambda: savings_trend_figure(chart_data))
+    st.plotly_chart(fig, use_container_width=True)
+
+def savings_history_chart(levels):
+    st.subheader("Savings history")
+    history_range = st.radio("Range", list(HISTORY_RANGES), index=len(HISTORY_RANGES) - 1, horizontal=True)
+    # Downsampled on the server: a bounded number of points per series, whatever the range
+    fig = figure_cache.get(
+        username, version, f"savings_history:{history_range}",
+        lambda: savings_history_figure(savings_history_frame(levels, HISTORY_RANGES[history_range]))
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def feasibility_surface_chart(surface):
+    st.subheader("What if? Target date vs monthly contribution")
+    st.caption("Advisor verdict for every target date and monthly saving amount; the cross marks your current plan.")
+    fig = figure_cache.get(username, version, "feasibility_surface", lambda: feasibility_surface_figure(surface))
+    st.plotly_chart(fig, use_container_width=True)
+
+def rule_50_30_20_chart(data, data_melted):
 
     #Grouped Bar chart
     st.subheader("Rule 50_30_20 - Actual vs Recommended")
@@ -168,63 +113,36 @@ def rule_50_30_20_chart(data):
     elif data["result"].get("follow_recommendations_success"):
         st.success(data["result"]["follow_recommendations_success"], icon="✅")
 
-    chart_data = pd.DataFrame({
-        "Category": ["Essentials", "Discretionary", "Savings"],
-        "Actual": data["result"]["rule_50_30_20"]["actual"],
-        "Recommended": data["result"]["rule_50_30_20"]["recommended"]
-    })
-
-    # Melt DataFrame to long format for grouped bar chart
-    data_melted = chart_data.melt(id_vars="Category", value_vars=["Actual", "Recommended"], 
-                            var_name="Type", value_name="Value")
-    bar_chart = px.bar(
-        data_melted,
-        x="Category",
-        y="Value",
-        color="Type",
-        barmode="group",  # Group bars side by side
-        title="Comparison of Actual vs Recommended Values",
-        labels={"Value": "Amount (DNT)"},
-        template="plotly_dark",
-        text_auto=True
-    )
+    bar_chart = figure_cache.get(username, version, "rule_50_30_20", lambda: rule_50_30_20_figure(data_melted))
     st.plotly_chart(bar_chart, use_container_width=True)
 
-# Open and read the JSON file
-# Check if the file is empty or invalid
-def is_file_empty_or_invalid(file_path):
-    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-        return False
-    return True
-
 try:
-    file_path = 'result.json'
+    # The record, its frames and its figures are only rebuilt when the user's record version changes
+    with metrics.time("fin_genius_charts_load_seconds"):
+        user_data, frames, version = chart_data_cache.get(username, get_store(), get_history())
 
-    # Check for empty file
-    if is_file_empty_or_invalid(file_path):
+    if not user_data:
         st.warning("Please fill in the form on the advisor page to be able to visualize charts", icon="⚠️")
+
     else:
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-        
-        # Check if data is an empty object or invalid
-
-        if not data or not data[username]:
-            st.warning("Please fill in the form on the advisor page to be able to visualize charts", icon="⚠️")
-
-        else:
-            # chart logic
-            rule_50_30_20_chart(data[username])
-            if data[username].get("result").get("budget_adjustement_solution_1") and data[username].get("result").get("budget_adjustement_solution_2"):
-                display_line_charts(data[username]["result"])
-            if data[username].get("vital_expenses"):  # Safely check if key exists and is not empty
-                vital_expenses_by_category(data[username])
-            if data[username].get("non_vital_expenses"):  # Safely check if key exists and is not empty
-                non_vital_expenses_by_category(data[username])
-            income_pie_chart(data[username])
+        # chart logic
+        rule_50_30_20_chart(user_data, frames["rule_50_30_20"])
+        if "saving_plans" in frames:
+            display_line_charts(user_data["result"], frames["saving_plans"])
+        if "vital_expenses" in frames:
+            vital_expenses_by_category(frames["vital_expenses"])
+        if "non_vital_expenses" in frames:
+            non_vital_expenses_by_category(frames["non_vital_expenses"])
+        income_pie_chart(frames["income_proportion"])
+        if "savings_trend" in frames:
+            savings_trend_chart(frames["savings_trend"])
+        if "savings_history" in frames:
+            savings_history_chart(frames["savings_history"])
+        if "feasibility_surface" in frames:
+            feasibility_surface_chart(frames["feasibility_surface"])
 
 except json.JSONDecodeError:
-    st.write("Error: result.json is not properly formatted. Please check the file content.")
+    st.write("Error: the stored results are not properly formatted. Please submit the advisor form again.")
 except Exception as e:
     st.write(f"An unexpected error occurred: {e}")
 
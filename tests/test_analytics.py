@@ -0,0 +1,79 @@
+import os
+import threading
+
+import pyarrow.compute as pc
+
+from analytics import LATEST_DIRECTORY, AnalyticsStore, analytics_row
+from storage import file_lock
+
+
+def _numbers(savings_rate):
+    return {"savings_rate": savings_rate, "goal_achievable": savings_rate > 100}
+
+
+def test_latest_rows_are_kept_per_user(tmp_path):
+    analytics = AnalyticsStore(str(tmp_path / "analytics"))
+    for day, (username, savings_rate) in enumerate([("alice", 50), ("bob", 300), ("alice", 200), ("carol", 10)]):
+        analytics.append(username, {"income": 1000}, _numbers(savings_rate), 1.7e9 + day * 86400)
+    # Older than the row already kept for bob
+    analytics.append("bob", {"income": 1000}, _numbers(1), 1.6e9)
+
+    assert analytics.query(["username"]).num_rows == 5
+    latest = analytics.query(["username", "savings_rate"], latest=True).sort_by("username")
+    assert latest.to_pydict() == {"username": ["alice", "bob", "carol"], "savings_rate": [200.0, 300.0, 10.0]}
+    achievable = analytics.query(["username"], filter=pc.field("goal_achievable"), latest=True).sort_by("username")
+    assert achievable["username"].to_pylist() == ["alice", "bob"]
+    assert analytics.summary()["users"] == 3
+
+
+def test_latest_rows_are_built_for_older_datasets(tmp_path):
+    analytics = AnalyticsStore(str(tmp_path / "analytics"))
+    # Appended before the latest dataset existed
+    analytics._write([
+        analytics_row(username, 1.7e9 + day, {"income": 1000}, _numbers(savings_rate))
+        for day, (username, savings_rate) in enumerate([("alice", 50), ("alice", 200), ("bob", 300)])
+    ])
+    assert not os.path.isdir(os.path.join(analytics.path, LATEST_DIRECTORY))
+    latest = analytics.query(["username", "savings_rate"], latest=True).sort_by("username")
+    assert latest.to_pydict() == {"username": ["alice", "bob"], "savings_rate": [200.0, 300.0]}
+
+
+def _many_files(path, files=40):
+    analytics = AnalyticsStore(path)
+    for i in range(files):
+        analytics.append(f"user_{i % 7}", {"income": 1000}, _numbers(i), 1.7e9 + i)
+    return analytics
+
+
+def test_compaction_waits_for_the_lock_of_other_processes(tmp_path):
+    analytics = _many_files(str(tmp_path / "analytics"))
+    finished = threading.Event()
+    # The lock as another process would hold it (flock locks are per open file)
+    with file_lock(analytics.lock_path):
+        thread = threading.Thread(target=lambda: analytics.compact() and finished.set())
+        thread.start()
+        assert not finished.wait(0.3)
+    thread.join(10)
+    assert finished.is_set()
+    assert analytics.query(["username"]).num_rows == 40
+
+
+def test_concurrent_compactions_keep_every_row(tmp_path):
+    path = str(tmp_path / "analytics")
+    _many_files(path)
+    errors = []
+
+    def compact():
+        try:
+            # Separate stores: only the file lock is shared, as between processes
+            AnalyticsStore(path).compact(min_files=1)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=compact) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert AnalyticsStore(path).query(["username"]).num_rows == 40
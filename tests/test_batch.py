@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch
+import expert
+
+
+def _random_frame(seed, rows=400):
+    rng = random.Random(seed)
+    categories = expert.vital_expenses + expert.non_mandatory_expenses
+    records = []
+    for i in range(rows):
+        # Categories missing from a row are NaN in the frame: not selected
+        record = {name: float(rng.choice([0, rng.randint(1, 900)])) for name in rng.sample(categories, rng.randint(0, 8))}
+        record["income"] = float(rng.randint(100, 6000))
+        record["saving"] = float(rng.choice([0, rng.randint(0, 20000)]))
+        record["saving_target"] = float(rng.choice([record["saving"], rng.randint(1, 40000)]))
+        record["saving_timeline"] = rng.randint(-3, 60) or 1
+        record["goal_description"] = f"goal {i}"
+        records.append(record)
+    return pd.DataFrame(records)
+
+
+def _edge_frame():
+    return pd.DataFrame([
+        # Expenses over income: the savings rate is clipped to 0
+        {"income": 1000.0, "saving": 0.0, "saving_target": 5000.0, "saving_timeline": 12, "rent": 900.0, "leisures": 400.0},
+        # Zero savings rate: the goal is impossible
+        {"income": 1000.0, "saving": 0.0, "saving_target": 5000.0, "saving_timeline": 12, "rent": 1000.0, "leisures": np.nan},
+        # Not feasible, with a positive savings rate: both budget adjustment solutions
+        {"income": 2000.0, "saving": 100.0, "saving_target": 90000.0, "saving_timeline": 6, "rent": 800.0, "leisures": 200.0},
+        # Feasible with the current savings only
+        {"income": 1100.0, "saving": 20000.0, "saving_target": 30000.0, "saving_timeline": 10, "rent": 1000.0, "leisures": np.nan},
+        # Savings already over the target
+        {"income": 3000.0, "saving": 5000.0, "saving_target": 4000.0, "saving_timeline": 3, "rent": np.nan, "leisures": 100.0},
+    ])
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_frames_match_the_engine(seed):
+    assert batch.parity_mismatches(_random_frame(seed)) == []
+
+
+def test_edge_cases_match_the_engine():
+    frame = _edge_frame()
+    results = batch.evaluate_frame(frame)
+    assert results[0]["rule_50_30_20"]["actual"][2] == 0
+    assert results[1]["budget_adjustement"] == expert.IMPOSSIBLE_GOAL_MESSAGE
+    assert "budget_adjustement_solution_1" in results[2]
+    assert results[3]["feasibility_check"] == expert.FEASIBLE_WITH_SAVINGS_MESSAGE
+    assert batch.parity_mismatches(frame) == []
@@ -0,0 +1,58 @@
+from chart_data import ChartDataCache
+from history import SubmissionHistory
+from storage import SqliteStore
+
+
+def test_a_record_without_result_has_no_charts(tmp_path):
+    store = SqliteStore(str(tmp_path / "result.db"))
+    history = SubmissionHistory(str(tmp_path / "result.db"))
+    store.update("alice", {"custom_categories": {"non_vital": {"Pets": None}}})
+    record, frames, _ = ChartDataCache().get("alice", store, history)
+    assert record is None and frames is None
+
+
+def test_the_surface_uses_the_latest_submission(tmp_path):
+    store = SqliteStore(str(tmp_path / "result.db"))
+    history = SubmissionHistory(str(tmp_path / "result.db"))
+    store.update("bob", {"income": 3000, "vital_expenses": {}, "non_vital_expenses": {}, "result": {
+        "rule_50_30_20": {"actual": [0, 0, 100], "recommended": [50, 30, 20]}, "savings_rate": "Savings rate: 3000",
+    }})
+    for timestamp, target in [(1.7e9, 5000), (1.7e9 + 60, 9000)]:
+        inputs = {"saving": 100, "saving_target": target, "saving_timeline": 12}
+        history.append("bob", inputs, {"savings_rate": 3000}, timestamp)
+    _, frames, _ = ChartDataCache().get("bob", store, history)
+    assert frames["feasibility_surface"]["required_rate"][0] == 9000
+
+
+class _CountingHistory(SubmissionHistory):
+    """History recording the start month of every entries() read."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.reads = []
+
+    def entries(self, username, start_month=None, end_month=None):
+        self.reads.append(start_month)
+        return super().entries(username, start_month, end_month)
+
+
+def test_new_submissions_extend_the_history_levels(tmp_path):
+    store = SqliteStore(str(tmp_path / "result.db"))
+    history = _CountingHistory(str(tmp_path / "result.db"))
+    record = {"income": 3000, "vital_expenses": {}, "non_vital_expenses": {}, "result": {
+        "rule_50_30_20": {"actual": [0, 0, 100], "recommended": [50, 30, 20]}, "savings_rate": "Savings rate: 3000",
+    }}
+    store.update("bob", record)
+    for day in range(3):
+        history.append("bob", {"saving": day, "saving_target": 9000, "saving_timeline": 12}, {"savings_rate": 3000}, 1.7e9 + day * 86400)
+    cache = ChartDataCache()
+    _, frames, _ = cache.get("bob", store, history)
+    assert len(frames["savings_history"]) == 3 and history.reads == [None]
+
+    history.append("bob", {"saving": 3, "saving_target": 9000, "saving_timeline": 12}, {"savings_rate": 3000}, 1.7e9 + 3 * 86400)
+    store.update("bob", record)
+    _, frames, _ = cache.get("bob", store, history)
+    assert len(frames["savings_history"]) == 4
+    # Only the month of the last submission already read is read again
+    assert history.reads == [None, "2023-11"]
+    assert frames["savings_history"].view()["Current savings"][1].tolist() == [0, 1, 2, 3]
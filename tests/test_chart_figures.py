@@ -0,0 +1,45 @@
+import plotly.graph_objects as go
+
+from chart_figures import FigureCache
+
+
+def _build(calls):
+    def build():
+        calls.append(1)
+        return go.Figure(go.Bar(x=["Essentials", "Savings"], y=[1200, 300]), layout={"title": "Budget"})
+    return build
+
+
+def test_a_figure_is_built_once_per_user_version_and_chart():
+    cache = FigureCache()
+    calls = []
+    first = cache.get("alice", 1, "rule_50_30_20", _build(calls))
+    second = cache.get("alice", 1, "rule_50_30_20", _build(calls))
+    assert len(calls) == 1
+    assert second.to_plotly_json() == first.to_plotly_json()
+    cache.get("alice", 2, "rule_50_30_20", _build(calls))
+    cache.get("alice", 2, "income_proportion", _build(calls))
+    cache.get("bob", 2, "income_proportion", _build(calls))
+    assert len(calls) == 4
+    assert cache.stats() == {"hits": 1, "misses": 4, "entries": 4}
+
+
+def test_sessions_get_their_own_figure():
+    cache = FigureCache()
+    calls = []
+    first = cache.get("alice", 1, "rule_50_30_20", _build(calls))
+    first.update_layout(title="Changed by one session")
+    second = cache.get("alice", 1, "rule_50_30_20", _build(calls))
+    second.data[0].y = (0, 0)
+    third = cache.get("alice", 1, "rule_50_30_20", _build(calls))
+    assert third.layout.title.text == "Budget"
+    assert third.data[0].y == (1200, 300)
+
+
+def test_least_recently_used_figures_are_evicted():
+    cache = FigureCache(max_entries=2)
+    calls = []
+    for chart in ["a", "b", "a", "c", "a", "b"]:
+        cache.get("alice", 1, chart, _build(calls))
+    # "b" was evicted by "c", "a" was kept by its reuse
+    assert len(calls) == 4
@@ -0,0 +1,34 @@
+import contextlib
+import io
+import random
+
+import pytest
+
+import expert
+
+
+def random_profile(rng, categories):
+    """A random advisor input (the arguments of expert.main), covering the edge cases of the rules."""
+    names = rng.sample(categories, rng.randint(0, min(6, len(categories))))
+    split = rng.randint(0, len(names))
+    vital = {name: float(rng.choice([0, rng.randint(1, 900)])) for name in names[:split]}
+    non_vital = {name: float(rng.randint(0, 600)) for name in names[split:]}
+    income = rng.choice([float(rng.randint(100, 6000)), rng.randint(100, 6000)])
+    saving = float(rng.choice([0, rng.randint(0, 20000)]))
+    saving_target = float(rng.choice([saving, saving + 1, rng.randint(1, 40000)]))
+    saving_timeline = rng.randint(1, 60)
+    return vital, non_vital, "goal", income, saving_target, saving, saving_timeline
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compiled_rules_match_the_rete_engine(seed):
+    rng = random.Random(seed)
+    categories = expert.vital_expenses + expert.non_mandatory_expenses
+    for _ in range(300):
+        profile = random_profile(rng, categories)
+        with contextlib.redirect_stdout(io.StringIO()):
+            rete_result = expert.main(*profile)
+            compiled_result = expert.main(*profile, compiled=True)
+        assert compiled_result == rete_result, profile
+        # Same keys in the same order: the advisor displays them in result order
+        assert list(compiled_result) == list(rete_result), profile
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import yaml
+
+from credential_store import CredentialStore
+
+
+def _store(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.dump({"credentials": {"usernames": {}}, "cookie": {"name": "fin", "key": "k", "expiry_days": 30}}))
+    return CredentialStore(str(path), coalesce_delay=0)
+
+
+class _ChangedWhileCopied:
+    """Value adding a user to its dict the first time it is copied, as a session would meanwhile."""
+
+    def __init__(self, usernames):
+        self.usernames = usernames
+
+    def __deepcopy__(self, memo):
+        if "late" not in self.usernames:
+            self.usernames["late"] = {"name": "Late"}
+        return "copied"
+
+
+def test_a_config_changed_during_the_copy_is_copied_again(tmp_path):
+    store = _store(tmp_path)
+    usernames = store.config["credentials"]["usernames"]
+    usernames["alice"] = {"name": "Alice", "token": _ChangedWhileCopied(usernames)}
+    assert store.flush()
+    with open(store.path) as infile:
+        written = yaml.safe_load(infile)
+    assert written["credentials"]["usernames"] == {"alice": {"name": "Alice", "token": "copied"}, "late": {"name": "Late"}}
+
+
+def test_changes_made_while_editing_are_written_whole(tmp_path):
+    store = _store(tmp_path)
+    done = threading.Event()
+
+    def register():
+        i = 0
+        while not done.is_set():
+            with store.editing() as config:
+                # Two steps that must never be written apart
+                config["credentials"]["usernames"][f"user_{i}"] = {"name": f"User {i}"}
+                time.sleep(0.0005)
+                config["registered"] = i
+            i += 1
+            time.sleep(0.0005)
+
+    thread = threading.Thread(target=register)
+    thread.start()
+    try:
+        for _ in range(100):
+            store.flush()
+            with open(store.path) as infile:
+                written = yaml.safe_load(infile)
+            if "registered" in written:
+                assert len(written["credentials"]["usernames"]) == written["registered"] + 1
+    finally:
+        done.set()
+        thread.join()
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from downsample import SeriesLevels
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_extended_levels_match_a_rebuild(seed):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.integers(1, 100, 20000))
+    y = rng.normal(size=len(x)).cumsum()
+    levels = SeriesLevels(x[:1], {"y": y[:1]}, max_points=50)
+    start = 1
+    while start < len(x):
+        end = start + int(rng.choice([1, 7, 300, 4000]))
+        levels = levels.extended(x[start:end], {"y": y[start:end]})
+        start = end
+        rebuilt = SeriesLevels(x[:end], {"y": y[:end]}, max_points=50)
+        assert len(levels.levels["y"][1]) == len(rebuilt.levels["y"][1])
+        for extended_level, rebuilt_level in zip(levels.levels["y"][1], rebuilt.levels["y"][1]):
+            np.testing.assert_array_equal(extended_level, rebuilt_level)
+    np.testing.assert_array_equal(levels.view()["y"][0], rebuilt.view()["y"][0])
+
+
+def test_points_before_the_last_one_rebuild():
+    levels = SeriesLevels(np.arange(10, 1000), {"y": np.arange(10, 1000) % 17}, max_points=50)
+    levels = levels.extended(np.arange(10), {"y": np.arange(10) % 17})
+    rebuilt = SeriesLevels(np.arange(1000), {"y": np.arange(1000) % 17}, max_points=50)
+    np.testing.assert_array_equal(levels.x, rebuilt.x)
+    for extended_level, rebuilt_level in zip(levels.levels["y"][1], rebuilt.levels["y"][1]):
+        np.testing.assert_array_equal(extended_level, rebuilt_level)
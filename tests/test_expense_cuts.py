@@ -0,0 +1,25 @@
+from expense_cuts import MAX_CATEGORIES, optimize_cuts
+
+
+def test_plans_cover_the_missing_amount_with_the_fewest_categories():
+    non_vital = {"leisures": 300.0, "gaming": 120.0, "dining_out": 400.0, "vacation": 250.0, "shopping": 350.0}
+    summary = optimize_cuts(3000, 1000, 30000, 24, {"rent": 900.0, "groceries": 500.0}, non_vital)
+    assert summary["feasible"]
+    for plan in summary["plans"]:
+        assert plan["categories_cut"] == 4
+        assert abs(sum(plan["cuts"].values()) - summary["needed"]) < 0.05
+
+
+def test_more_categories_than_enumerated():
+    non_vital = {f"c{i}": 10.0 for i in range(MAX_CATEGORIES + 4)}
+    summary = optimize_cuts(1200, 0, 3950, 10, {"rent": 800.0}, non_vital)
+    assert summary["feasible"]
+    assert summary["plans"][0]["categories_cut"] == MAX_CATEGORIES + 4
+    assert abs(sum(summary["plans"][0]["cuts"].values()) - summary["needed"]) < 0.05
+
+
+def test_not_enough_room():
+    summary = optimize_cuts(1000, 0, 30000, 12, {"rent": 900.0}, {"dining_out": 50.0})
+    assert not summary["feasible"]
+    assert summary["plans"] == []
+    assert summary["shortfall"] > 0
@@ -0,0 +1,78 @@
+import time
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from goals import _on_time_goals, solve_goals
+
+
+def _feasible(amounts, deadlines, subset, savings_rate):
+    total = 0.0
+    for index in sorted(subset, key=lambda index: deadlines[index]):
+        total += amounts[index]
+        if total > savings_rate * deadlines[index] + 1e-9:
+            return False
+    return True
+
+
+def _best_level_count(amounts, deadlines, priorities, savings_rate, fixed, level):
+    """Brute force: the most goals of level that fit on time next to the goals of fixed."""
+    candidates = np.flatnonzero((priorities == level) & ~fixed)
+    for size in range(len(candidates), -1, -1):
+        for subset in combinations(candidates, size):
+            if _feasible(amounts, deadlines, [*np.flatnonzero(fixed), *subset], savings_rate):
+                return size
+    return None
+
+
+def test_high_priority_deadlines_are_kept_before_lower_priority_counts():
+    amounts = np.array([9, 4, 12, 2, 13], dtype=float)
+    deadlines = np.array([6, 4, 8, 9, 6], dtype=float)
+    priorities = np.array([1, 0, 1, 0, 1])
+    kept = _on_time_goals(amounts, deadlines, priorities, 2)
+    # One priority 1 goal is the most that fits; the smaller one (9, due month 6) leaves room for the 2 due month 9
+    assert kept.tolist() == [True, False, False, True, False]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_each_level_keeps_the_most_goals_next_to_the_levels_above(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(1000):
+        count = int(rng.integers(1, 8))
+        amounts = rng.integers(0, 15, count).astype(float)
+        deadlines = rng.integers(1, 10, count).astype(float)
+        priorities = rng.integers(0, 3, count)
+        savings_rate = float(rng.integers(1, 4))
+        kept = _on_time_goals(amounts, deadlines, priorities, savings_rate)
+        assert _feasible(amounts, deadlines, np.flatnonzero(kept), savings_rate)
+        for level in np.unique(priorities)[::-1]:
+            fixed = kept & (priorities > level)
+            best = _best_level_count(amounts, deadlines, priorities, savings_rate, fixed, level)
+            assert np.sum(kept & (priorities == level)) == best
+
+
+def test_hundreds_of_goals_over_several_levels():
+    rng = np.random.default_rng(0)
+    goals = [
+        {"name": f"goal {i}", "target": float(rng.integers(100, 5000)), "deadline": int(rng.integers(1, 120)),
+         "priority": int(rng.integers(0, 5))}
+        for i in range(500)
+    ]
+    start = time.perf_counter()
+    plan = solve_goals(goals, 1500)
+    assert time.perf_counter() - start < 2
+    assert len(plan["on_time"]) + len(plan["missed"]) == 500
+
+
+@pytest.mark.parametrize("goals, savings_rate", [
+    ([], 100),
+    ([{"name": "car", "target": 1000, "deadline": 10}], 0),
+    ([{"name": "car", "target": 1000, "deadline": 10, "saved": 1000}], 100),
+])
+def test_zero_horizon(goals, savings_rate):
+    plan = solve_goals(goals, savings_rate)
+    assert plan["months"] == []
+    for goal in goals:
+        expected = 0 if goal.get("saved", 0) >= goal["target"] else None
+        assert plan["completion_month"][goal["name"]] == expected
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from history import PROGRESS_ACHIEVED_MESSAGE, PROGRESS_BEHIND_MESSAGE, SubmissionHistory, track_progress
+
+
+def _entry(history, saving=1000, goal_description="car", saving_target=7000):
+    inputs = {"goal_description": goal_description, "saving": saving, "saving_target": saving_target, "saving_timeline": 12}
+    results = {"monthly_milestone": 500.0, "savings_rate": 600}
+    return history.append("alice", inputs, results, datetime(2025, 1, 15).timestamp())
+
+
+def test_progress_is_measured_against_the_months_elapsed(tmp_path):
+    previous = _entry(SubmissionHistory(str(tmp_path / "result.db")))
+    two_months_later = datetime(2025, 3, 2).timestamp()
+    assert track_progress(previous, 2000, "car", 7000, two_months_later) == PROGRESS_ACHIEVED_MESSAGE
+    assert track_progress(previous, 1800, "car", 7000, two_months_later) == PROGRESS_BEHIND_MESSAGE.format(200)
+
+
+def test_no_verdict_within_the_same_month(tmp_path):
+    previous = _entry(SubmissionHistory(str(tmp_path / "result.db")))
+    assert track_progress(previous, 1000, "car", 7000, datetime(2025, 1, 28).timestamp()) is None
+
+
+def test_no_verdict_for_another_goal_or_target(tmp_path):
+    previous = _entry(SubmissionHistory(str(tmp_path / "result.db")))
+    next_month = datetime(2025, 2, 15).timestamp()
+    assert track_progress(previous, 5000, "house", 7000, next_month) is None
+    assert track_progress(previous, 5000, "car", 9000, next_month) is None
+    assert track_progress(None, 5000, "car", 7000, next_month) is None
+
+
+def test_latest_reads_compacted_months(tmp_path):
+    history = SubmissionHistory(str(tmp_path / "result.db"))
+    _entry(history, saving=1000)
+    history.append("alice", {"saving": 1500}, {"monthly_milestone": None}, datetime(2025, 2, 3).timestamp())
+    assert history.compact("2025-03") == 2
+    assert history.latest("alice")["inputs"]["saving"] == 1500
+    assert [entry["inputs"]["saving"] for entry in history.entries("alice")] == [1000, 1500]
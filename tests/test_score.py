@@ -0,0 +1,31 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import batch
+from score import score_file
+
+
+def test_invalid_rows_are_reported_and_the_others_scored(tmp_path):
+    frame = pd.DataFrame({
+        "income": [2000.0, 1500.0, 3000.0, np.nan, 2500.0],
+        "saving": [100.0, 0.0, 500.0, 0.0, 0.0],
+        "saving_target": [5000.0, 4000.0, 6000.0, 1000.0, 9000.0],
+        "saving_timeline": [12, 0, 24, 6, 10],
+        "rent": [800.0, 700.0, np.nan, 500.0, 900.0],
+    })
+    frame.to_csv(tmp_path / "profiles.csv", index=False)
+    report = io.StringIO()
+    rows, _ = score_file(str(tmp_path / "profiles.csv"), str(tmp_path / "scores.parquet"), chunk_size=2, workers=1, report=report)
+
+    scores = pq.read_table(tmp_path / "scores.parquet").to_pandas()
+    assert rows == 5 and scores["row"].tolist() == [0, 1, 2, 3, 4]
+    assert scores["error"].notna().tolist() == [False, True, False, True, False]
+    assert scores["feasibility_check"].isna().tolist() == [False, True, False, True, False]
+    expected = batch.evaluate_frame(frame.iloc[[0, 2, 4]])
+    assert scores["feasibility_check"].dropna().tolist() == [result["feasibility_check"] for result in expected]
+    assert "Row 1 not scored: saving_timeline must not be 0" in report.getvalue()
+    assert "Row 3 not scored: missing income" in report.getvalue()
+    assert "2 rows could not be scored" in report.getvalue()
@@ -0,0 +1,112 @@
+import io
+
+import pyarrow as pa
+import pytest
+
+from statements import UNCLASSIFIED, detect_decimal, ingest_statement, parse_amounts, read_csv_chunks
+from taxonomy import load_taxonomy
+
+
+def test_detect_decimal():
+    assert detect_decimal(["-45,30", "1.234,50", "12"]) == ","
+    assert detect_decimal(["-45.30", "1,234.50", "(40.00)"]) == "."
+    assert detect_decimal(["1,234", "-12.5 TND"]) == "."
+    # Only ambiguous amounts: the delimiter decides
+    assert detect_decimal(["1,234", "7"], delimiter=";") == ","
+    assert detect_decimal(["1,234", "7"], delimiter=",") == "."
+
+
+def test_parse_amounts_with_decimal_comma():
+    values = pa.array(["-45,30", "1.234,50", "(40,00)", "bad"], pa.string())
+    assert parse_amounts(values, ",").to_pylist() == [-45.3, 1234.5, -40.0, None]
+
+
+def test_csv_with_decimal_comma():
+    statement = io.BytesIO(
+        "Date;Libelle;Montant\n"
+        "02/01/2025;Carrefour Market;-45,30\n"
+        "05/01/2025;Loyer;-1.200,00\n"
+        "28/01/2025;Salaire;2.500,00\n".encode()
+    )
+    (table,) = read_csv_chunks(statement)
+    assert table.column("amount").to_pylist() == [-45.3, -1200.0, 2500.0]
+
+    statement = io.BytesIO(b"date,description,amount\n2025-01-02,Grocery,\"-1,045.30\"\n2025-01-03,Cafe,-4.5\n")
+    (table,) = read_csv_chunks(statement)
+    assert table.column("amount").to_pylist() == [-1045.3, -4.5]
+
+
+CSV_STATEMENT = b"""Date,Description,Amount
+2025-01-03,CARREFOUR MARKET LA MARSA,-120.50
+2025-01-05,LANDLORD JANUARY,-800.00
+2025-01-12,NETFLIX.COM REF866579,-15.99
+2025-01-28,SALARY ACME,2500.00
+2025-02-02,CARREFOUR MARKET LA MARSA,-80.00
+2025-02-05,LANDLORD FEBRUARY,-800.00
+2025-02-14,RESTAURANT LE GOLFE,-60.00
+2025-02-20,XYZ 123 UNKNOWN SHOP,-40.00
+2025-02-27,SALARY ACME,2500.00
+not a date,CARREFOUR,-10.00
+"""
+
+OFX_STATEMENT = b"""OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250110120000<TRNAMT>-45.30<NAME>MONOPRIX ENNASR</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250118<TRNAMT>-30.00<NAME>UBER EATS<MEMO>dinner</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250130<TRNAMT>1800.00<NAME>SALARY</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250204<TRNAMT>-54.70<MEMO>MONOPRIX ENNASR</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+@pytest.fixture(scope="module")
+def taxonomy():
+    return load_taxonomy([], [])
+
+
+def test_csv_statement_monthly_totals(taxonomy):
+    totals = ingest_statement(io.BytesIO(CSV_STATEMENT), taxonomy, name="statement.csv")
+    assert (totals.rows, totals.skipped) == (10, 1)
+    expenses = totals.monthly_expenses()
+    assert expenses.loc["2025-01"].to_dict() == pytest.approx({
+        "groceries": 120.5, "rent": 800.0, "subscriptions": 15.99, "dining_out": 0.0, UNCLASSIFIED: 0.0,
+    })
+    assert expenses.loc["2025-02"].to_dict() == pytest.approx({
+        "groceries": 80.0, "rent": 800.0, "subscriptions": 0.0, "dining_out": 60.0, UNCLASSIFIED: 40.0,
+    })
+    assert totals.income == {"2025-01": 2500.0, "2025-02": 2500.0}
+
+
+def test_csv_statement_advisor_inputs(taxonomy):
+    totals = ingest_statement(io.BytesIO(CSV_STATEMENT), taxonomy, name="statement.csv")
+    vital, non_vital, income, unclassified = totals.advisor_inputs(taxonomy, months=2)
+    assert vital == {"groceries": 100.25, "rent": 800.0}
+    assert non_vital == {"subscriptions": 8.0, "dining_out": 30.0}
+    assert (income, unclassified) == (2500.0, 20.0)
+    # Only the last month
+    vital, non_vital, income, unclassified = totals.advisor_inputs(taxonomy, months=1)
+    assert vital == {"groceries": 80.0, "rent": 800.0}
+    assert non_vital == {"dining_out": 60.0}
+
+
+def test_ofx_statement(taxonomy):
+    totals = ingest_statement(io.BytesIO(OFX_STATEMENT), taxonomy, name="statement.ofx")
+    assert (totals.rows, totals.skipped) == (4, 0)
+    expenses = totals.monthly_expenses()
+    assert expenses.loc["2025-01"].to_dict() == pytest.approx({"groceries": 45.3, "dining_out": 30.0})
+    assert expenses.loc["2025-02"].to_dict() == pytest.approx({"groceries": 54.7, "dining_out": 0.0})
+    vital, non_vital, income, unclassified = totals.advisor_inputs(taxonomy)
+    assert vital == {"groceries": 50.0}
+    assert non_vital == {"dining_out": 15.0}
+    assert (income, unclassified) == (900.0, 0.0)
+
+
+def test_debit_and_credit_columns_with_decimal_comma(taxonomy):
+    statement = (
+        "Date;Libelle;Debit;Credit\n"
+        "03/01/2025;MONOPRIX ENNASR;45,30;\n"
+        "28/01/2025;VIREMENT SALAIRE;;1.800,00\n"
+    ).encode()
+    totals = ingest_statement(io.BytesIO(statement), taxonomy, name="releve.csv", dayfirst=True)
+    assert totals.monthly_expenses().loc["2025-01"].to_dict() == pytest.approx({"groceries": 45.3})
+    assert totals.income == {"2025-01": 1800.0}
@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from storage import JsonFileStore, SqliteStore, WriteBehindStore
+
+
+class _SlowStore(JsonFileStore):
+    """JSON store whose batch writes wait for the test to let them through."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.writing = threading.Event()
+        self.proceed = threading.Event()
+
+    def update_many(self, updates):
+        self.writing.set()
+        self.proceed.wait(5)
+        super().update_many(updates)
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        return JsonFileStore(str(tmp_path / "result.json"))
+    return SqliteStore(str(tmp_path / "result.db"))
+
+
+def test_updates_coalesce_and_drain_on_close(store):
+    queue = WriteBehindStore(store, interval=60)
+    threads = [
+        threading.Thread(target=lambda t=t: [queue.update(f"user_{i % 10}", {f"t{t}": i}) for i in range(100)])
+        for t in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert queue.get("user_3")["t2"] == 93
+    queue.close()
+    assert sorted(store.usernames()) == [f"user_{i}" for i in range(10)]
+    assert store.get("user_3") == {"t0": 93, "t1": 93, "t2": 93, "t3": 93}
+
+
+def test_reads_during_a_flush_see_the_records_being_written(tmp_path):
+    slow_store = _SlowStore(str(tmp_path / "result.json"))
+    queue = WriteBehindStore(slow_store, interval=60)
+    queue.update("bob", {"custom_categories": {"vital": {"childcare": None}}})
+    flusher = threading.Thread(target=queue.flush)
+    flusher.start()
+    assert slow_store.writing.wait(5)
+    assert queue.get("bob") == {"custom_categories": {"vital": {"childcare": None}}}
+    slow_store.proceed.set()
+    flusher.join()
+    assert slow_store.get("bob") == {"custom_categories": {"vital": {"childcare": None}}}
+    queue.close()
+
+
+def test_a_bad_record_does_not_block_other_users(store):
+    queue = WriteBehindStore(store, interval=60)
+    queue.update("alice", {"income": 1000})
+    queue.update("mallory", {"income": object()})
+    assert queue.flush() == 1
+    assert store.get("alice") == {"income": 1000}
+    queue.update("alice", {"income": 2000})
+    queue.flush()
+    queue.flush()
+    assert store.get("alice") == {"income": 2000}
+    assert store.get("mallory") is None
+    assert queue.stats()["pending"] == 0
+    queue.close()
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from taxonomy import TAXONOMY_PATH, load_taxonomy
+
+
+@pytest.fixture(scope="module")
+def taxonomy():
+    return load_taxonomy([], [])
+
+
+@pytest.mark.parametrize("label", [
+    "TOTAL CREDIT CARD PAYMENT",
+    "Book market",
+    "Power bank",
+    "Policy Bazaar",
+    "Mobile banking fee",
+    "Bar code scanner",
+    "Club Med",
+    "Credit agricole",
+])
+def test_generic_words_do_not_classify(taxonomy, label):
+    assert taxonomy.classify(label) is None
+
+
+@pytest.mark.parametrize("label, category", [
+    ("Parking downtown", "transportation"),
+    ("TOTALENERGIES STATION 12", "transportation"),
+    ("Carrefour Market La Marsa", "groceries"),
+    ("Wine bar Sidi Bou Said", "socializing"),
+    ("Amusement park", "leisures"),
+    ("NETFLIX.COM REF866579", "subscriptions"),
+    ("Restaurnt Le Golfe", "dining_out"),
+    ("netflx", "subscriptions"),
+])
+def test_labels_classify(taxonomy, label, category):
+    assert taxonomy.classify(label) == category
+
+
+def test_the_default_file_does_not_depend_on_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert os.path.isabs(TAXONOMY_PATH) and os.path.exists(TAXONOMY_PATH)
+    assert load_taxonomy([], []).classify("netflix") == "subscriptions"